@@ -0,0 +1,96 @@
+# Micro-benchmark for the text normalizer against the previous two-pass / per-call regex approach.
+#
+#   python benchmarks/bench_normalizer.py [story.txt ...] [--repeat N]
+#
+# Without story files a synthetic corpus is generated from common words and every rule key.
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from replacements import ABBREVIATIONS, CURSE_WORDS, DISPLAY_ABBREVIATIONS, DISPLAY_NORMALIZER, TTS_NORMALIZER
+
+FILLER = "I my the and to was he she we they a of that it in for but so at his her when said just like told".split()
+
+def synthetic_corpus(words=200000, seed=7):
+    rng = random.Random(seed)
+    keys = list(ABBREVIATIONS) + list(CURSE_WORDS) + list(DISPLAY_ABBREVIATIONS)
+    tokens = []
+    for _ in range(words):
+        word = rng.choice(keys) if rng.random() < 0.05 else rng.choice(FILLER)
+        roll = rng.random()
+        tokens.append(word.upper() if roll < 0.1 else word.title() if roll < 0.2 else word)
+    return " ".join(tokens)
+
+def legacy_tts(text):
+    def replacer(table):
+        def replace(match):
+            phrase = match.group(0)
+            full = table[phrase.lower()]
+            if phrase.isupper():
+                return full.upper()
+            elif phrase.istitle():
+                return full.title()
+            return full
+        return replace
+    pattern = re.compile(r"\b(" + "|".join(re.escape(key) for key in ABBREVIATIONS) + r")\b", re.IGNORECASE)
+    curse_pattern = re.compile(r"\b(" + "|".join(re.escape(key) for key in CURSE_WORDS) + r")\b", re.IGNORECASE)
+    return curse_pattern.sub(replacer(CURSE_WORDS), pattern.sub(replacer(ABBREVIATIONS), text))
+
+def legacy_display(text):
+    # The old Subtitles.abbreviations rebuilt and recompiled its pattern on every call
+    def replace(match):
+        phrase = match.group(0)
+        abbr = DISPLAY_ABBREVIATIONS[phrase.lower()]
+        if phrase.isupper():
+            return abbr.upper()
+        elif phrase[0].isupper():
+            return abbr
+        return abbr.lower()
+    pattern = r"\b(" + "|".join(re.escape(key) for key in sorted(DISPLAY_ABBREVIATIONS, key=len, reverse=True)) + r")\b"
+    return re.sub(pattern, replace, text, flags=re.IGNORECASE)
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def run(corpus, repeat=5):
+    words = corpus.split()
+    results = {
+        "tts_legacy": best_of(lambda: legacy_tts(corpus), repeat),
+        "tts_normalizer": best_of(lambda: TTS_NORMALIZER.apply(corpus), repeat),
+        # generate_srt normalizes one word at a time with words_per_subtitle=1
+        "display_per_word_legacy": best_of(lambda: [legacy_display(word) for word in words], repeat),
+        "display_per_word_normalizer": best_of(lambda: [DISPLAY_NORMALIZER.apply(word) for word in words], repeat),
+    }
+    assert legacy_tts(corpus) == TTS_NORMALIZER.apply(corpus), "normalizer output differs from the legacy two-pass result"
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("stories", nargs="*", help="story text files to use as the corpus")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.stories:
+        corpus = " ".join(open(path, "r", encoding="utf-8").read() for path in args.stories)
+    else:
+        corpus = synthetic_corpus()
+
+    print(f"Corpus: {len(corpus.split())} words, {len(corpus)} characters")
+    results = run(corpus, args.repeat)
+    for name, seconds in results.items():
+        print(f"{name:30s} {seconds * 1000:9.1f} ms")
+    print(f"TTS speedup: {results['tts_legacy'] / results['tts_normalizer']:.1f}x")
+    print(f"Per-word display speedup: {results['display_per_word_legacy'] / results['display_per_word_normalizer']:.1f}x")
+
+if __name__ == "__main__":
+    main()
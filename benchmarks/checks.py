@@ -0,0 +1,119 @@
+# Output checks for code that has to agree with pydub or with how ffmpeg parses what we generate.
+# Like the benchmarks they need no network, models or media files:
+#
+#   python benchmarks/checks.py
+#
+# A check is skipped when the library it compares against is not installed; the exit code is 1 if
+# any check failed.
+import contextlib
+import io
+import os
+import sys
+import traceback
+import warnings
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, BENCH_DIR)
+
+import numpy as np
+from stubs import StubMediaInfo, synthetic_voice
+
+SAMPLE_RATE = 24000
+
+class Skip(Exception):
+    pass
+
+CHECKS = []
+
+def check(func):
+    CHECKS.append(func)
+    return func
+
+def import_or_skip(module):
+    try:
+        with warnings.catch_warnings():
+            # pydub warns about a missing ffmpeg on import; these checks never call it
+            warnings.simplefilter("ignore", RuntimeWarning)
+            return __import__(module)
+    except ImportError as e:
+        raise Skip(f"missing dependency: {e.name}")
+
+@check
+def fade_matches_pydub():
+    # AudioBuffer.fade replaced TTS._fade's pydub fade_in/fade_out; the gain curves must agree,
+    # including the short (per-sample) and long (per-millisecond) fades pydub treats differently
+    tts = import_or_skip("tts")
+    pydub = import_or_skip("pydub")
+    samples = np.clip(synthetic_voice(2, SAMPLE_RATE, lead=0, tail=0) * 2, -1, 1)
+    pcm = (samples * 32767).astype(np.int16)
+    segment = pydub.AudioSegment(pcm.tobytes(), frame_rate=SAMPLE_RATE, sample_width=2, channels=1)
+    for fade_in, fade_out in ((200, 0), (0, 500), (50, 80), (500, 500)):
+        expected = segment
+        if fade_in:
+            expected = expected.fade_in(fade_in)
+        if fade_out:
+            expected = expected.fade_out(fade_out)
+        expected = np.frombuffer(expected.raw_data, dtype=np.int16) / 32767
+        actual = tts.AudioBuffer(pcm / 32767, SAMPLE_RATE).fade(fade_in, fade_out).samples
+        # pydub's long fades hold each gain for a millisecond, so allow one step of difference
+        error = np.max(np.abs(actual - expected))
+        if error > 0.01:
+            raise AssertionError(f"fade({fade_in}, {fade_out}) differs from pydub by up to {error:.4f}")
+
+def ffmpeg_token(text, terms):
+    # av_get_token: reads up to an unescaped, unquoted terminator; a backslash escapes the next
+    # character and '...' is copied verbatim. Returns the unescaped token and the rest of the text.
+    token, i = "", 0
+    while i < len(text) and text[i] not in terms:
+        if text[i] == "\\" and i + 1 < len(text):
+            token += text[i + 1]
+            i += 2
+        elif text[i] == "'":
+            end = text.index("'", i + 1)
+            token += text[i + 1:end]
+            i = end + 1
+        else:
+            token += text[i]
+            i += 1
+    return token, text[i:]
+
+@check
+def subtitle_filter_path_survives_parsing():
+    # The subtitles filter reads its filename after ffmpeg unescapes the filter graph and then the
+    # filter's options; quotes, colons and commas in the path must come through unchanged
+    ffmpeg_video_generator = import_or_skip("ffmpeg_video_generator")
+    path = "/tmp/it's 10:30, [draft]; a\\b/subtitles.ass"
+    generator = ffmpeg_video_generator.FFmpegVideoGenerator(media_info=StubMediaInfo())
+    with contextlib.redirect_stdout(io.StringIO()):
+        generator.create_project()
+        generator.add_background_video("background.mp4", duration=10, start=5)
+        generator.add_subtitles(path)
+    command = generator.build_command("out.mp4")
+    graph = command[command.index("-filter_complex") + 1]
+    args, _ = ffmpeg_token(graph.split("subtitles=", 1)[1], "[],;")
+    key, value = args.split("=", 1)
+    filename, _ = ffmpeg_token(value, ":")
+    expected = os.path.abspath(path).replace("\\", "/")
+    if key != "filename" or filename != expected:
+        raise AssertionError(f"ffmpeg would read the subtitles path as {filename!r}, expected {expected!r}")
+
+def main():
+    failed = 0
+    for func in CHECKS:
+        try:
+            func()
+        except Skip as e:
+            print(f"{func.__name__:<42}skipped ({e})")
+        except Exception:
+            failed += 1
+            print(f"{func.__name__:<42}FAILED")
+            traceback.print_exc()
+        else:
+            print(f"{func.__name__:<42}ok")
+    if failed:
+        print(f"{failed} check(s) failed")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
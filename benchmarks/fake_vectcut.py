@@ -0,0 +1,118 @@
+# Local stand-in for the VectCut API: accepts the calls TikTokVideoGenerator makes, keeps drafts in memory
+# and writes a dfd_<draft_id>/draft_content.json on save_draft, like the real server does.
+#
+#   python benchmarks/fake_vectcut.py [--port 9001] [--latency-ms 0] [--dir ./results/fake-vectcut]
+#
+# Point VECTCUT_PORT / VECTCUT_DIR at it to run main() without CapCut tooling.
+import argparse
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TRACK_ENDPOINTS = {"add_video", "add_audio", "add_image", "add_subtitle"}
+
+class FakeVectCut:
+    def __init__(self, port=0, latency=0.0, draft_dir=None):
+        self.latency = latency
+        self.draft_dir = draft_dir or tempfile.mkdtemp(prefix="fake-vectcut-")
+        self.drafts = {}
+        self.calls = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.draft_dir, exist_ok=True)
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-vectcut", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def handle(self, endpoint, data):
+        # "batch" is the optional VECTCUT_BATCH_ENDPOINT shape: {"requests": [{"endpoint", "data"}, ...]}
+        if endpoint == "batch":
+            return {"results": [self.handle(call["endpoint"], call["data"]) for call in data.get("requests", [])]}
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            if endpoint == "create_draft":
+                draft_id = uuid.uuid4().hex[:16]
+                self.drafts[draft_id] = {"width": data.get("width"), "height": data.get("height"), "tracks": []}
+                return {"draft_id": draft_id}
+            draft = self.drafts.get(data.get("draft_id"))
+            if draft is None:
+                raise KeyError(f"Unknown draft_id {data.get('draft_id')}")
+            if endpoint in TRACK_ENDPOINTS:
+                draft["tracks"].append(dict(data, type=endpoint))
+                return {}
+            if endpoint == "save_draft":
+                folder = os.path.join(self.draft_dir, f"dfd_{data['draft_id']}")
+                os.makedirs(folder, exist_ok=True)
+                with open(os.path.join(folder, "draft_content.json"), "w", encoding="utf-8") as f:
+                    json.dump(draft, f)
+                return {"draft_url": folder}
+        raise KeyError(f"Unknown endpoint {endpoint}")
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes; without this, Nagle + delayed ACK adds ~40ms per call
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    data = json.loads(self.rfile.read(length) or b"{}")
+                    if fake.latency:
+                        time.sleep(fake.latency)
+                    body = {"success": True, "output": fake.handle(self.path.strip("/"), data)}
+                except Exception as e:
+                    body = {"success": False, "error": str(e)}
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--dir", default=None)
+    args = parser.parse_args()
+
+    server = FakeVectCut(args.port, args.latency_ms / 1000, args.dir)
+    print(f"Fake VectCut listening on {server.url}, drafts in {server.draft_dir}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,72 @@
+# Writes the Reddit fixtures the benchmarks replay, in RedditFetcher's record-mode format.
+# The posts are generated deterministically so the fixtures never go stale; real responses can be
+# recorded into the same folder with REDDIT_FETCH_MODE=record REDDIT_FIXTURES=benchmarks/fixtures/reddit.
+#
+#   python benchmarks/fixtures/make_reddit_fixtures.py
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "..", "..", "src"))
+
+from reddit_story_fetcher import RedditFetcher
+from workspace import write_json_atomic
+
+FIXTURES_DIR = os.path.join(ROOT, "reddit")
+SUBREDDIT = "benchmark"
+POSTS = 8
+WORDS = (
+    "I my mom dad sister brother friend boyfriend girlfriend wife husband coworker boss told said asked never always "
+    "found out that was the and but so when after before because she he they we it this story wedding party house "
+    "money secret week year night later finally honestly tbh AITA TIL NGL apparently everyone nobody"
+).split()
+
+def story_text(rng, words):
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(6, 22))
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        sentences.append(sentence[0].upper() + sentence[1:] + rng.choice([".", ".", ".", "!", "?"]))
+        words -= length
+    paragraphs = [" ".join(sentences[i:i + 5]) for i in range(0, len(sentences), 5)]
+    return "\n\n".join(paragraphs)
+
+def post_link(post):
+    return f"https://www.reddit.com{post['permalink']}"
+
+def make_posts(seed=42):
+    rng = random.Random(seed)
+    posts = []
+    for i in range(POSTS):
+        post_id = f"bench{i:02d}"
+        posts.append({
+            "id": post_id,
+            "name": f"t3_{post_id}",
+            "title": f"AITA for what happened at my sister's wedding, part {i + 1}",
+            "selftext": story_text(rng, rng.randint(250, 1400)),
+            "subreddit": SUBREDDIT,
+            "permalink": f"/r/{SUBREDDIT}/comments/{post_id}/benchmark_story_{i}/",
+            "score": 5000 - i * 400,
+            "over_18": i == 3,
+            "is_self": True,
+            "stickied": False,
+        })
+    return posts
+
+def main():
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    posts = make_posts()
+    for post in posts:
+        url = f"{post_link(post).rstrip('/')}.json"
+        data = [{"kind": "Listing", "data": {"children": [{"kind": "t3", "data": post}]}}, {"kind": "Listing", "data": {"children": []}}]
+        write_json_atomic(os.path.join(FIXTURES_DIR, RedditFetcher._entry_name(url)), {"url": url, "data": data})
+
+    # Same URL StoryHarvester builds for its first page of r/benchmark top of the day
+    listing_url = f"https://www.reddit.com/r/{SUBREDDIT}/top.json?t=day&limit=100&raw_json=1"
+    listing = {"kind": "Listing", "data": {"after": None, "children": [{"kind": "t3", "data": post} for post in posts]}}
+    write_json_atomic(os.path.join(FIXTURES_DIR, RedditFetcher._entry_name(listing_url)), {"url": listing_url, "data": listing})
+    print(f"Wrote {len(posts) + 1} fixtures to {FIXTURES_DIR}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+# Reproducible benchmark suite that needs no network, VectCut, CapCut or browser.
+#
+#   python benchmarks/run.py                          # base tier: startup, normalize, srt, audio, e2e
+#   python benchmarks/run.py --suite srt audio        # only some suites
+#   python benchmarks/run.py --tier models            # also Kokoro synthesis and WhisperX alignment
+#   python benchmarks/run.py --update-baseline        # record this machine's medians as its baseline
+#   python benchmarks/run.py --compare                # fail on regressions against that baseline
+#
+# Timings depend on the machine, so no baseline is committed: the baseline file is recorded locally
+# (benchmarks/baselines.json is git-ignored). With --compare, a benchmark whose median is more than
+# --threshold times the baseline is reported as a regression and the exit code is 1.
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_normalizer import synthetic_corpus
+from fake_vectcut import FakeVectCut
+from stubs import StubFrameRenderer, StubMediaInfo, fixture_links, synthetic_timeline, synthetic_voice
+
+BASELINES_PATH = os.path.join(BENCH_DIR, "baselines.json")
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures", "reddit")
+SAMPLE_RATE = 24000
+
+class Skip(Exception):
+    pass
+
+BENCHMARKS = []
+
+def benchmark(suite, tier="base"):
+    # Registers a setup function that returns the zero-argument callable to time
+    def decorator(setup):
+        BENCHMARKS.append({"name": f"{suite}.{setup.__name__}", "suite": suite, "tier": tier, "setup": setup})
+        return setup
+    return decorator
+
+def require_ffmpeg():
+    if not shutil.which("ffmpeg"):
+        raise Skip("ffmpeg not on PATH")
+
+def import_or_skip(module):
+    try:
+        return __import__(module)
+    except ImportError as e:
+        raise Skip(f"missing dependency: {e.name}")
+
+HEAVY_MODULES = ("torch", "kokoro", "whisperx", "playwright", "pydub")
+
+@benchmark("startup")
+def import_main(args):
+    # What `python src/main.py test` and harvesting cron jobs pay before doing anything.
+    # Fails outright if a heavy dependency is imported at module load again.
+    command = [sys.executable, "-c", f"import sys; import main; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"]
+    src = os.path.join(BENCH_DIR, "..", "src")
+
+    def run():
+        output = subprocess.run(command, cwd=src, capture_output=True, text=True, check=True).stdout.strip()
+        if output:
+            raise RuntimeError(f"importing main loaded {output}; keep these imports inside the functions that use them")
+
+    return run
+
+@benchmark("normalize")
+def tts_corpus(args):
+    from replacements import TTS_NORMALIZER
+    corpus = synthetic_corpus(words=200000)
+    return lambda: TTS_NORMALIZER.apply(corpus)
+
+@benchmark("normalize")
+def display_per_word(args):
+    from replacements import DISPLAY_NORMALIZER
+    words = synthetic_corpus(words=50000).split()
+    return lambda: [DISPLAY_NORMALIZER.apply(word) for word in words]
+
+@benchmark("srt")
+def srt_word_by_word(args):
+    from subtitle_builder import SubtitleBuilder
+    timeline, duration = synthetic_timeline(synthetic_corpus(words=20000), missing_every=50)
+    builder = SubtitleBuilder(words_per_subtitle=1)
+    output = os.path.join(args.tmp, "bench.srt")
+    return lambda: builder.write(builder.build(timeline, duration), output)
+
+@benchmark("srt")
+def ass_karaoke_lines(args):
+    from subtitle_builder import SubtitleBuilder
+    timeline, duration = synthetic_timeline(synthetic_corpus(words=20000), missing_every=50)
+    builder = SubtitleBuilder(max_chars=24, max_duration=2.5, break_on_punctuation=True)
+    output = os.path.join(args.tmp, "bench.ass")
+    return lambda: builder.write(builder.build(timeline, duration), output, "ass")
+
+@benchmark("audio")
+def trim_fade_5min(args):
+    tts = import_or_skip("tts")
+    buffer = tts.AudioBuffer(synthetic_voice(300, SAMPLE_RATE), SAMPLE_RATE)
+    return lambda: buffer.trim_silence()[0].fade(200, 0)
+
+@benchmark("audio")
+def encode_mp3_5min(args):
+    require_ffmpeg()
+    tts = import_or_skip("tts")
+    buffer = tts.AudioBuffer(synthetic_voice(300, SAMPLE_RATE), SAMPLE_RATE)
+    output = os.path.join(args.tmp, "bench.mp3")
+    return lambda: buffer.encode(output)
+
+@benchmark("audio")
+def write_wav_5min(args):
+    tts = import_or_skip("tts")
+    buffer = tts.AudioBuffer(synthetic_voice(300, SAMPLE_RATE), SAMPLE_RATE)
+    output = os.path.join(args.tmp, "bench.wav")
+    return lambda: buffer.write_wav(output)
+
+@contextlib.contextmanager
+def environment(values):
+    saved = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+def runner_class(story_runner):
+    # main()'s StoryRunner and stage pipeline, with the browser and ffprobe swapped for stubs
+    from media_info import BackgroundVideoPool
+
+    class BenchRunner(story_runner.StoryRunner):
+        def __init__(self):
+            super().__init__()
+            self.frame_renderer = StubFrameRenderer()
+            self.media_info = StubMediaInfo()
+            self.background_pool = BackgroundVideoPool(self.background_pool.videos, self.media_info)
+
+    return BenchRunner
+
+def build_batch(args, runner_class):
+    # One StoryRunner.run() per timed run, over recorded Reddit fixtures and a fake VectCut, the way
+    # main() drives it. The CapCut import goes to a CapCut folder under a temporary home directory.
+    require_ffmpeg()
+    from job_manifest import DEFAULT_SPEED, make_job
+
+    # Repeats of a post are narrated at another speed, so every job gets its own story workspace
+    links = fixture_links(FIXTURES_DIR)
+    jobs = [make_job({"id": f"story_{i}", "link": links[i % len(links)], "speed": DEFAULT_SPEED + 0.05 * (i // len(links))}) for i in range(args.stories)]
+
+    def run():
+        root = tempfile.mkdtemp(dir=args.tmp)
+        home = os.path.join(root, "home")
+        os.makedirs(os.path.join(home, "AppData", "Local", "CapCut", "User Data", "Projects", "com.lveditor.draft"))
+        server = FakeVectCut(draft_dir=os.path.join(root, "vectcut"), latency=args.vectcut_latency).start()
+        env = {
+            "RESULTS_DIR": os.path.join(root, "results"),
+            "RENDER_BACKEND": "capcut",
+            "VECTCUT_PORT": str(server.server.server_port),
+            "VECTCUT_DIR": server.draft_dir,
+            # Only read by the frame renderer and ffprobe, which are stubbed
+            "AVATAR_PATH": os.path.join(root, "avatar.png"),
+            "BG_VIDEO": os.path.join(root, "background.mp4"),
+            "FRAME_RENDERER": "local",
+            "REDDIT_FETCH_MODE": "offline",
+            "REDDIT_FIXTURES": FIXTURES_DIR,
+            "USE_CACHE": "false",
+            "TRACE": "false",
+            "HOME": home,
+            "USERPROFILE": home,
+        }
+        try:
+            with environment(env), contextlib.redirect_stdout(io.StringIO()):
+                with runner_class() as runner:
+                    outcomes = runner.run(jobs, runner.open_ledger("bench"))
+        finally:
+            server.stop()
+            shutil.rmtree(root, ignore_errors=True)
+        failed = [outcome for outcome in outcomes if outcome["status"] != "done"]
+        if failed:
+            raise RuntimeError(f"{len(failed)} stories failed, first at '{failed[0]['stage']}': {failed[0]['error']}")
+
+    return run
+
+@benchmark("e2e")
+def story_batch(args):
+    from story_harvester import estimate_duration
+    story_runner = import_or_skip("story_runner")
+    tts = import_or_skip("tts")
+
+    voices = {}
+
+    def synthetic(text, seed):
+        # Noise shaped like speech, as long as the narration would be. Generated during the warm-up
+        # run and reused, so the timed runs measure the pipeline rather than the random generator.
+        if (text, seed) not in voices:
+            timeline, _ = synthetic_timeline(text, start=0.4)
+            voices[(text, seed)] = (synthetic_voice(estimate_duration(text), SAMPLE_RATE, seed=seed), timeline)
+        samples, timeline = voices[(text, seed)]
+        return tts.AudioBuffer(samples, SAMPLE_RATE), timeline
+
+    class SyntheticVoiceRunner(runner_class(story_runner)):
+        # Only Kokoro is replaced; trimming, fades, encoding, subtitles, parts and assembly are the real stages
+        def warm_up(self, jobs=None):
+            pass
+
+        def synthesize_title(self, story):
+            return {"buffer": synthetic(story["fetch"]["title"], story["index"])[0]}
+
+        def synthesize_voice(self, story):
+            buffer, timeline = synthetic(story["fetch"]["text"], story["index"])
+            return {"buffer": buffer, "timeline": timeline}
+
+    return build_batch(args, SyntheticVoiceRunner)
+
+@benchmark("e2e", tier="models")
+def story_batch_kokoro(args):
+    story_runner = import_or_skip("story_runner")
+    import_or_skip("kokoro")
+    return build_batch(args, runner_class(story_runner))
+
+@benchmark("models", tier="models")
+def kokoro_paragraph(args):
+    tts = import_or_skip("tts")
+    import_or_skip("kokoro")
+    text = synthetic_corpus(words=200)
+    narrator = tts.TTS(result_folder=args.tmp)
+    narrator.warm_up()
+    return lambda: narrator.synthesize_buffer(text)
+
+@benchmark("models", tier="models")
+def kokoro_four_variants(args):
+    # Same paragraph as kokoro_paragraph in two voices at two speeds; compare the two medians
+    tts = import_or_skip("tts")
+    import_or_skip("kokoro")
+    text = synthetic_corpus(words=200)
+    narrator = tts.TTS(result_folder=args.tmp)
+    variants = [{"gender": gender, "speed": speed} for gender in ("f", "m") for speed in (1.0, 1.15)]
+    tts.warm_up(["af_heart", "am_adam"])
+
+    def run():
+        tts.phonemize.cache_clear()
+        return narrator.synthesize_variants(text, variants)
+    return run
+
+@benchmark("models", tier="models")
+def whisperx_align_paragraph(args):
+    tts = import_or_skip("tts")
+    subtitles = import_or_skip("subtitles")
+    import_or_skip("kokoro")
+    text = synthetic_corpus(words=200)
+    buffer, _ = tts.TTS(result_folder=args.tmp).synthesize_buffer(text)
+    wav = buffer.write_wav(os.path.join(args.tmp, "align.wav"))
+    aligner = subtitles.Subtitles(result_folder=args.tmp)
+    return lambda: aligner.align(wav, text)
+
+def measure(func, repeat):
+    func()  # warm-up: imports, caches, first-touch allocations
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {"median": statistics.median(timings), "min": min(timings), "max": max(timings)}
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite")
+    parser.add_argument("--suite", nargs="*", help="suites to run (startup, normalize, srt, audio, e2e, models); default all in the tier")
+    parser.add_argument("--tier", choices=["base", "models"], default="base", help="'models' adds the Kokoro/WhisperX benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--stories", type=int, default=8, help="stories per end-to-end batch")
+    parser.add_argument("--vectcut-latency", type=float, default=0.0, help="seconds the fake VectCut waits per call")
+    parser.add_argument("--baseline", default=BASELINES_PATH, help="baseline file recorded on this machine")
+    parser.add_argument("--compare", action="store_true", help="exit with status 1 when a benchmark regressed against the baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown factor over the baseline that counts as a regression")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    tiers = {"base"} if args.tier == "base" else {"base", "models"}
+    selected = [bench for bench in BENCHMARKS if bench["tier"] in tiers and (not args.suite or bench["suite"] in args.suite)]
+    baselines = load_baselines(args.baseline)
+    if args.compare:
+        if not baselines:
+            parser.error(f"no baseline at {args.baseline}; record one on this machine with --update-baseline first")
+        if baselines.get("machine") != platform.platform() or baselines.get("python") != platform.python_version():
+            print(f"Warning: the baseline was recorded on {baselines.get('machine')} (Python {baselines.get('python')}), ratios may not mean much here")
+    results = {}
+    regressions = []
+
+    print(f"{'benchmark':<34}{'median':>10}{'min':>10}{'baseline':>10}{'ratio':>8}")
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        args.tmp = tmp
+        for bench in selected:
+            try:
+                func = bench["setup"](args)
+                timing = measure(func, args.repeat)
+            except Skip as e:
+                print(f"{bench['name']:<34}  skipped ({e})")
+                continue
+            results[bench["name"]] = timing
+            baseline = baselines.get("benchmarks", {}).get(bench["name"])
+            ratio = timing["median"] / baseline["median"] if baseline else None
+            flag = ""
+            if args.compare and ratio is not None and ratio > args.threshold:
+                regressions.append(bench["name"])
+                flag = "  REGRESSION"
+            baseline_text = f"{baseline['median'] * 1000:>8.1f}ms" if baseline else f"{'-':>10}"
+            ratio_text = f"{ratio:>7.2f}x" if ratio is not None else f"{'-':>8}"
+            print(f"{bench['name']:<34}{timing['median'] * 1000:>8.1f}ms{timing['min'] * 1000:>8.1f}ms{baseline_text}{ratio_text}{flag}")
+
+    if args.update_baseline:
+        stored = baselines.get("benchmarks", {})
+        stored.update({name: {"median": round(timing["median"], 6)} for name, timing in results.items()})
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"machine": platform.platform(), "python": platform.python_version(), "benchmarks": stored}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baselines updated in {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.2f}x: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
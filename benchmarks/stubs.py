@@ -0,0 +1,77 @@
+# Deterministic stand-ins for the parts of the pipeline that need models, browsers or media files.
+import json
+import os
+import re
+import numpy as np
+from PIL import Image
+from media_info import MediaInfoCache
+from workspace import atomic_path
+
+class StubFrameRenderer:
+    # Same interface as RedditFrameImage / LocalRedditFrameImage, writes a blank card instantly
+    def __init__(self, size=(900, 420)):
+        self.size = size
+
+    def start(self):
+        return self
+
+    def close(self):
+        pass
+
+    def download_frame_image(self, text, upvotes=67000, comments=4100, filename="reddit_frame_image.png", output_path=None):
+        output_path = output_path or filename
+        with atomic_path(output_path) as tmp_path:
+            Image.new("RGBA", self.size, (255, 255, 255, 255)).save(tmp_path, format="PNG")
+        return output_path
+
+class StubMediaInfo(MediaInfoCache):
+    # MediaInfoCache whose probes answer with a fixed-length video, so no ffprobe or media file is needed
+    def __init__(self, duration=900.0, keyframe_interval=2.0):
+        super().__init__()
+        self._duration = duration
+        self._keyframe_interval = keyframe_interval
+
+    @staticmethod
+    def _key(path):
+        return os.path.abspath(path)
+
+    def _probe(self, path):
+        return {"duration": self._duration, "format": "mov,mp4,m4a,3gp,3g2,mj2", "streams": [{"index": 0, "codec_type": "video", "codec_name": "h264", "width": 1080, "height": 1920}]}
+
+    def _probe_keyframes(self, path):
+        return [round(i * self._keyframe_interval, 3) for i in range(int(self._duration / self._keyframe_interval))]
+
+def synthetic_timeline(text, words_per_second=2.8, start=0.1, missing_every=0):
+    # Word timings the way Kokoro reports them; every `missing_every`-th word is left unaligned
+    words = []
+    t = start
+    for i, word in enumerate(re.findall(r"\S+", text)):
+        duration = 0.12 + 0.04 * len(word) / words_per_second
+        entry = {"word": word}
+        if not missing_every or i % missing_every:
+            entry.update(start=round(t, 3), end=round(t + duration, 3))
+        words.append(entry)
+        t += duration + (0.25 if word.endswith((".", "!", "?")) else 0.06)
+    return {"segments": [{"text": text, "start": start, "end": t, "words": words}]}, t
+
+def synthetic_voice(seconds, sample_rate=24000, lead=0.4, tail=0.6, seed=0):
+    # Speech-like noise bursts between stretches of near silence, float32 like Kokoro's output
+    rng = np.random.default_rng(seed)
+    total = int((lead + seconds + tail) * sample_rate)
+    samples = np.zeros(total, dtype=np.float32)
+    body = slice(int(lead * sample_rate), int((lead + seconds) * sample_rate))
+    length = body.stop - body.start
+    envelope = (np.sin(np.linspace(0, seconds * 2 * np.pi * 3, length)) > -0.3).astype(np.float32)
+    samples[body] = rng.normal(0, 0.2, length).astype(np.float32) * envelope
+    samples += rng.normal(0, 1e-4, total).astype(np.float32)
+    return samples
+
+def fixture_links(fixtures_dir):
+    # Post links recorded in a fixtures folder, in a stable order
+    links = []
+    for name in sorted(os.listdir(fixtures_dir)):
+        with open(os.path.join(fixtures_dir, name), "r", encoding="utf-8") as f:
+            url = json.load(f)["url"]
+        if "/comments/" in url:
+            links.append(url[:-len(".json")])
+    return links
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from workspace import atomic_path, file_sha256
+
+META_FILE = "meta.json"
+
+def _json_default(value):
+    # NumPy scalars and arrays (e.g. alignment scores) convert to the equivalent Python values;
+    # tolist() is tried first because item() only works on single-element arrays
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class CacheEntry:
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def copy_to(self, name, output_path):
+        with atomic_path(output_path) as tmp_path:
+            shutil.copyfile(self.file(name), tmp_path)
+        return output_path
+
+class ArtifactCache:
+    # On-disk, content-addressed cache: <root>/<stage>/<key[:2]>/<key>/ holds the cached files plus meta.json.
+    # meta.json's mtime is the last-used time, which drives LRU eviction once max_bytes is exceeded.
+    # The total size is kept as a running count; the tree is only walked to establish it and when
+    # it goes over the limit, which also corrects drift from other processes sharing the cache.
+    # Eviction frees down to low_water of the limit so the next stores don't walk again.
+
+    def __init__(self, root, max_bytes=5 * 1024 ** 3, low_water=0.9):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._total = None
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def file_key(path):
+        return file_sha256(path)
+
+    def _entry_dir(self, stage, key):
+        return os.path.join(self.root, stage, key[:2], key)
+
+    def _count(self, stage, field):
+        with self._lock:
+            stats = self._stats.setdefault(stage, {"hits": 0, "misses": 0, "stores": 0, "evictions": 0})
+            stats[field] += 1
+
+    def get(self, stage, key):
+        entry_dir = self._entry_dir(stage, key)
+        meta_path = os.path.join(entry_dir, META_FILE)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            os.utime(meta_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._count(stage, "misses")
+            return None
+        self._count(stage, "hits")
+        return CacheEntry(entry_dir, meta)
+
+    def put(self, stage, key, files=None, meta=None):
+        entry_dir = self._entry_dir(stage, key)
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=f".{key[:8]}.", dir=os.path.dirname(entry_dir))
+        try:
+            size = 0
+            for name, source in (files or {}).items():
+                # Sources are file paths, or raw bytes for artifacts that only exist in memory
+                if isinstance(source, bytes):
+                    with open(os.path.join(tmp_dir, name), "wb") as f:
+                        f.write(source)
+                else:
+                    shutil.copyfile(source, os.path.join(tmp_dir, name))
+                size += os.path.getsize(os.path.join(tmp_dir, name))
+            with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as f:
+                json.dump({"stage": stage, "size": size, "created": time.time(), **(meta or {})}, f, ensure_ascii=False, default=_json_default)
+            size += os.path.getsize(os.path.join(tmp_dir, META_FILE))
+            try:
+                os.rename(tmp_dir, entry_dir)
+                with self._lock:
+                    if self._total is not None:
+                        self._total += size
+            except OSError:
+                # Another worker stored the same key first; its entry is equivalent
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        self._count(stage, "stores")
+        self.evict()
+        return CacheEntry(entry_dir, meta or {})
+
+    def fetch_or_create(self, stage, key, output_path, create):
+        # create() must write output_path and return a JSON-serialisable metadata dict
+        name = "output" + os.path.splitext(output_path)[1]
+        entry = self.get(stage, key)
+        if entry is not None:
+            try:
+                entry.copy_to(name, output_path)
+                return entry.meta
+            except FileNotFoundError:
+                pass
+        meta = create()
+        self.put(stage, key, {name: output_path}, meta)
+        return meta
+
+    def _entries(self):
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if META_FILE in filenames:
+                meta_path = os.path.join(dirpath, META_FILE)
+                try:
+                    size = sum(os.path.getsize(os.path.join(dirpath, name)) for name in filenames)
+                    entries.append((os.path.getmtime(meta_path), size, dirpath))
+                except FileNotFoundError:
+                    continue
+                dirnames[:] = []
+        return entries
+
+    def size(self):
+        total = sum(size for _, size, _ in self._entries())
+        with self._lock:
+            self._total = total
+        return total
+
+    def evict(self):
+        with self._lock:
+            total = self._total
+        if total is not None and total <= self.max_bytes:
+            return
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * self.low_water if total > self.max_bytes else self.max_bytes
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            stage = os.path.relpath(path, self.root).split(os.sep)[0]
+            self._count(stage, "evictions")
+        with self._lock:
+            self._total = total
+
+    def stats(self):
+        with self._lock:
+            return {stage: dict(values) for stage, values in self._stats.items()}
+
+    def print_stats(self):
+        stats = self.stats()
+        if not stats:
+            return
+        print("Cache statistics:")
+        for stage, values in sorted(stats.items()):
+            lookups = values["hits"] + values["misses"]
+            hit_rate = values["hits"] / lookups * 100 if lookups else 0.0
+            print(f"- {stage}: {values['hits']} hits, {values['misses']} misses ({hit_rate:.0f}% hit rate), {values['evictions']} evictions")
@@ -18,5 +18,6 @@ def add_hashtags(title, hashtags, max_length=150):
     
     return cropped[:last_space]
 
-def generate_caption(title, hashtags, max_length=150):
-    return f"[FULL STORY] {add_hashtags(title, hashtags, max_length - len('[FULL STORY] '))}"
+def generate_caption(title, hashtags, max_length=150, part=None, part_count=None):
+    prefix = f"[PART {part}/{part_count}] " if part_count and part_count > 1 else "[FULL STORY] "
+    return f"{prefix}{add_hashtags(title, hashtags, max_length - len(prefix))}"
@@ -0,0 +1,203 @@
+import os
+import subprocess
+import random
+from instrumentation import traced
+from media_info import MediaInfoCache
+from workspace import atomic_path
+
+ASS_PLAY_RES_Y = 288  # libass scales SRT styles against this height
+SUBTITLE_FONT_SCALE = 0.6  # maps VectCut/CapCut font sizes onto ASS font sizes
+
+def _escape_filter_path(path):
+    # Two rounds of ffmpeg's backslash escaping, unquoted: one for the filter's option string and one
+    # for the filter graph around it. Inside '...' a backslash escapes nothing, so a quote can't be quoted.
+    value = path.replace("\\", "/")
+    for special in ("\\':", "\\'[],;"):
+        value = "".join(f"\\{char}" if char in special else char for char in value)
+    return value
+
+def _ass_color(hex_color, alpha=1.0):
+    hex_color = hex_color.lstrip("#")
+    r, g, b = hex_color[0:2], hex_color[2:4], hex_color[4:6]
+    return f"&H{int(round((1 - alpha) * 255)):02X}{b}{g}{r}".upper()
+
+class FFmpegVideoGenerator:
+    # Same calls as TikTokVideoGenerator, but every track is collected into one ffmpeg filter graph
+    # and render() writes a finished MP4 in a single encode pass, without VectCut or CapCut.
+
+    def __init__(self, media_info=None, preset="veryfast", crf=20, fps=30):
+        self.media_info = media_info or MediaInfoCache()
+        self.preset = preset
+        self.crf = crf
+        self.fps = fps
+        self.draft_id = None
+
+    def create_project(self, width=1080, height=1920):
+        self.width = width
+        self.height = height
+        self.background = None
+        self.images = []
+        self.audios = []
+        self.subtitles = []
+        self.draft_id = f"ffmpeg_{random.getrandbits(32):08x}"
+        print(f"Project created with Draft ID: {self.draft_id}")
+        return self.draft_id
+
+    def begin_batch(self):
+        pass
+
+    def flush(self):
+        return []
+
+    def add_background_video(self, video_path, volume=0, speed=1.0, track_name="main", duration=None, start=None):
+        if not self.draft_id:
+            raise Exception("Draft ID is not set. Create a project first.")
+
+        original_duration = self.media_info.duration(video_path)
+        if duration is None:
+            duration = original_duration - 5 # exclude first 5 seconds
+        else:
+            duration = min(duration, original_duration - 5)
+
+        if start is None:
+            start = random.choices(range(5, int(original_duration - duration + 1)))[0]
+
+        self.background = {"path": video_path, "start": start, "duration": duration, "volume": volume, "speed": speed}
+        print(f"Background video added successfully: {os.path.basename(video_path)}")
+        return self.background, duration
+
+    def add_initial_image(self, image_path, duration=3.0):
+        if not self.draft_id:
+            raise Exception("Draft ID is not set. Create a project first.")
+
+        self.images.append({"path": image_path, "start": 0, "end": duration, "scale": 0.8})
+        print(f"Initial image added successfully: {os.path.basename(image_path)}")
+        return self.images[-1]
+
+    def add_audio(self, audio_path, start=0, end=None, target_start=0, volume=1.0, speed=1.0, track_name="voice"):
+        if not self.draft_id:
+            raise Exception("Draft ID is not set. Create a project first.")
+
+        self.audios.append({"path": audio_path, "start": start, "end": end, "target_start": target_start, "volume": volume, "speed": speed})
+        print(f"Voice audio added successfully: {os.path.basename(audio_path)}")
+        return self.audios[-1]
+
+    def add_subtitles(self, srt_url, time_offset=0, font="Nunito", font_size=5, font_color="#FFFFFF", transform_y=-0.8, scale=0.8):
+        if not self.draft_id:
+            raise Exception("Draft ID is not set. Create a project first.")
+
+        self.subtitles.append({
+            "path": srt_url,
+            "time_offset": time_offset,
+            "font": font,
+            "font_size": font_size,
+            "font_color": font_color,
+            "transform_y": transform_y,
+            "scale": scale,
+        })
+        print(f"Subtitles added successfully from: {os.path.basename(srt_url)}")
+        return self.subtitles[-1]
+
+    def _subtitle_style(self, subtitle):
+        font_size = subtitle["font_size"] * subtitle["scale"] * SUBTITLE_FONT_SCALE
+        # CapCut's transform_y runs from 1 (top) to -1 (bottom) around the centre of the canvas
+        center_from_top = 0.5 - subtitle["transform_y"] / 2
+        margin_v = max(0, int(ASS_PLAY_RES_Y * (1 - center_from_top) - font_size / 2))
+        return ",".join([
+            f"FontName={subtitle['font']}",
+            f"FontSize={font_size:.1f}",
+            f"PrimaryColour={_ass_color(subtitle['font_color'])}",
+            f"OutlineColour={_ass_color('#000000')}",
+            "BorderStyle=1",
+            "Outline=3",
+            "Shadow=0",
+            "Bold=1",
+            "Alignment=2",
+            f"MarginV={margin_v}",
+        ])
+
+    def build_command(self, output_path):
+        if self.background is None:
+            raise Exception("A background video is required before rendering.")
+
+        background = self.background
+        total_duration = background["duration"]
+        inputs = ["-ss", f"{background['start']:.3f}", "-t", f"{total_duration / background['speed']:.3f}", "-i", background["path"]]
+        filters = [
+            f"[0:v]setpts=(PTS-STARTPTS)/{background['speed']},"
+            f"scale={self.width}:{self.height}:force_original_aspect_ratio=increase,"
+            f"crop={self.width}:{self.height},setsar=1,fps={self.fps}[base]"
+        ]
+        video_label = "base"
+        input_index = 1
+
+        for i, image in enumerate(self.images):
+            inputs += ["-loop", "1", "-t", f"{image['end']:.3f}", "-i", image["path"]]
+            filters.append(f"[{input_index}:v]scale={int(self.width * image['scale'])}:-1[img{i}]")
+            filters.append(
+                f"[{video_label}][img{i}]overlay=(W-w)/2:(H-h)/2:eof_action=pass:"
+                f"enable='between(t,{image['start']:.3f},{image['end']:.3f})'[vimg{i}]"
+            )
+            video_label = f"vimg{i}"
+            input_index += 1
+
+        for i, subtitle in enumerate(self.subtitles):
+            # The subtitles filter has no offset option, so timestamps are shifted around it
+            offset = subtitle["time_offset"]
+            # ASS files carry their own styling (and karaoke tags), force_style would flatten it
+            style = "" if subtitle["path"].endswith(".ass") else f":force_style='{self._subtitle_style(subtitle)}'"
+            filters.append(
+                f"[{video_label}]setpts=PTS-{offset:.3f}/TB,"
+                f"subtitles=filename={_escape_filter_path(os.path.abspath(subtitle['path']))}{style},"
+                f"setpts=PTS+{offset:.3f}/TB[vsub{i}]"
+            )
+            video_label = f"vsub{i}"
+
+        audio_labels = []
+        if background["volume"] > 0:
+            filters.append(f"[0:a]atempo={background['speed']},volume={background['volume']}[abg]")
+            audio_labels.append("abg")
+
+        for i, audio in enumerate(self.audios):
+            inputs += ["-i", audio["path"]]
+            trim = f"atrim=start={audio['start']:.3f}" + (f":end={audio['end']:.3f}" if audio["end"] is not None else "")
+            delay = int(round(audio["target_start"] * 1000))
+            filters.append(
+                f"[{input_index}:a]{trim},asetpts=PTS-STARTPTS,atempo={audio['speed']},"
+                f"volume={audio['volume']},adelay={delay}:all=1[a{i}]"
+            )
+            audio_labels.append(f"a{i}")
+            input_index += 1
+
+        maps = ["-map", f"[{video_label}]"]
+        if audio_labels:
+            filters.append("".join(f"[{label}]" for label in audio_labels) + f"amix=inputs={len(audio_labels)}:duration=longest:normalize=0[aout]")
+            maps += ["-map", "[aout]"]
+
+        return [
+            "ffmpeg", "-y", "-v", "error",
+            *inputs,
+            "-filter_complex", ";".join(filters),
+            *maps,
+            "-t", f"{total_duration:.3f}",
+            "-c:v", "libx264", "-preset", self.preset, "-crf", str(self.crf), "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-b:a", "192k",
+            "-movflags", "+faststart",
+            output_path,
+        ]
+
+    @traced("ffmpeg.render")
+    def render(self, output_path):
+        if not self.draft_id:
+            raise Exception("Draft ID is not set. Create a project first.")
+
+        print("Rendering video with ffmpeg...")
+        try:
+            with atomic_path(output_path) as tmp_path:
+                subprocess.run(self.build_command(tmp_path), check=True)
+        except subprocess.CalledProcessError as e:
+            print(f"Failed to render video: {str(e)}")
+            return {"success": False, "error": str(e)}
+
+        print(f"Video rendered successfully at {output_path}")
+        return {"success": True, "output_path": os.path.abspath(output_path)}
@@ -0,0 +1,215 @@
+import contextlib
+import contextvars
+import cProfile
+import functools
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, RSS and child CPU are left out
+    resource = None
+
+_current_story = contextvars.ContextVar("story", default=None)
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _child_cpu():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def output_bytes(result):
+    # Size of whatever files a call returned: a path, or paths inside a tuple/list/dict (one level deep)
+    if isinstance(result, str):
+        return os.path.getsize(result) if len(result) < 4096 and os.path.isfile(result) else 0
+    if isinstance(result, dict):
+        result = list(result.values())
+    if isinstance(result, (tuple, list)):
+        return sum(output_bytes(item) for item in result if isinstance(item, str))
+    return 0
+
+class Tracer:
+    # Records one span per instrumented call or pipeline stage: wall time, CPU time of the whole process
+    # (torch runs Kokoro and WhisperX on its own intra-op threads) plus reaped subprocesses such as ffmpeg,
+    # CPU time of the calling thread alone, the process peak RSS when it ended and the bytes it wrote.
+    # Spans are kept in memory for the summary and appended to a JSONL trace when a path is set.
+    # Process CPU, peak RSS and subprocess CPU are process-wide, so with several stories in flight they are upper bounds.
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.spans = []
+        self._lock = threading.Lock()
+        self._file = None
+
+    def configure(self, path=None, enabled=True):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self.enabled = enabled
+            self.path = path
+            if enabled and path:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def close(self):
+        # Stops tracing but keeps the recorded spans for the summary
+        with self._lock:
+            self.enabled = False
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def reset(self):
+        # Drops the in-memory spans (the trace file keeps them); long-lived processes call it per batch
+        with self._lock:
+            self.spans = []
+
+    @contextlib.contextmanager
+    def span(self, stage, kind="call", story=None, **attributes):
+        if not self.enabled:
+            yield {}
+            return
+        record = {"story": story or _current_story.get(), "stage": stage, "kind": kind, "bytes_written": 0}
+        record.update(attributes)
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        start_thread_cpu = time.thread_time()
+        start_child = _child_cpu()
+        record["start"] = time.time()
+        try:
+            yield record
+        except BaseException as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record["wall"] = round(time.perf_counter() - start_wall, 6)
+            record["cpu"] = round(time.process_time() - start_cpu, 6)
+            record["thread_cpu"] = round(time.thread_time() - start_thread_cpu, 6)
+            record["child_cpu"] = round(_child_cpu() - start_child, 6)
+            record["peak_rss_mb"] = _peak_rss_mb()
+            self._emit(record)
+
+    def _emit(self, record):
+        with self._lock:
+            self.spans.append(record)
+            if self._file is not None:
+                self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    def summary(self, kind=None):
+        stages = {}
+        with self._lock:
+            spans = [span for span in self.spans if kind is None or span["kind"] == kind]
+        for span in spans:
+            stages.setdefault((span["kind"], span["stage"]), []).append(span)
+        rows = []
+        for (span_kind, stage), group in stages.items():
+            walls = [span["wall"] for span in group]
+            cpus = [span["cpu"] + span["child_cpu"] for span in group]
+            rss = [span["peak_rss_mb"] for span in group if span["peak_rss_mb"] is not None]
+            rows.append({
+                "kind": span_kind,
+                "stage": stage,
+                "count": len(group),
+                "errors": sum(1 for span in group if "error" in span),
+                "total": sum(walls),
+                "p50": _percentile(walls, 0.5),
+                "p95": _percentile(walls, 0.95),
+                "cpu_p50": _percentile(cpus, 0.5),
+                "cpu_p95": _percentile(cpus, 0.95),
+                "peak_rss_mb": max(rss) if rss else None,
+                "bytes_written": sum(span["bytes_written"] for span in group),
+            })
+        return sorted(rows, key=lambda row: (row["kind"] != "stage", -row["total"]))
+
+    def print_summary(self):
+        rows = self.summary()
+        if not rows:
+            return
+        print("\nRun report (seconds):")
+        print(f"{'stage':<36}{'kind':>6}{'n':>5}{'err':>4}{'total':>9}{'p50':>8}{'p95':>8}{'cpu50':>8}{'cpu95':>8}{'rss MB':>8}{'written':>10}")
+        for row in rows:
+            rss = f"{row['peak_rss_mb']:.0f}" if row["peak_rss_mb"] is not None else "-"
+            print(
+                f"{row['stage'][:35]:<36}{row['kind']:>6}{row['count']:>5}{row['errors']:>4}{row['total']:>9.2f}{row['p50']:>8.2f}{row['p95']:>8.2f}"
+                f"{row['cpu_p50']:>8.2f}{row['cpu_p95']:>8.2f}{rss:>8}{row['bytes_written'] / 1024 ** 2:>8.1f}MB"
+            )
+        print("cpu = process CPU incl. torch threads and subprocesses; with stories running in parallel it includes theirs")
+        if self.path:
+            print(f"Trace written to {self.path}")
+
+TRACER = Tracer()
+
+@contextlib.contextmanager
+def story_scope(story_id):
+    # Spans opened inside (on this thread) are attributed to the story
+    token = _current_story.set(story_id)
+    try:
+        yield
+    finally:
+        _current_story.reset(token)
+
+def traced(stage, bytes_of=output_bytes):
+    # Decorator: `stage` is the span name, or a callable building it from the call's arguments.
+    # Costs one attribute check per call while tracing is off.
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TRACER.enabled:
+                return func(*args, **kwargs)
+            name = stage(*args, **kwargs) if callable(stage) else stage
+            with TRACER.span(name) as record:
+                result = func(*args, **kwargs)
+                if bytes_of is not None:
+                    record["bytes_written"] = bytes_of(result)
+                return result
+        return wrapper
+    return decorator
+
+_profile_lock = threading.Lock()
+
+@contextlib.contextmanager
+def profiled(output_path, mode="cprofile"):
+    # cProfile only sees the calling thread, which is the stage worker running this story.
+    # py-spy samples the whole process from outside and writes a flame graph; it must be on PATH.
+    # Only one profile runs at a time (Python 3.12+ refuses concurrent cProfile sessions), so parallel
+    # stages of the profiled story wait for each other.
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with _profile_lock:
+        with _profile(output_path, mode):
+            yield
+
+@contextlib.contextmanager
+def _profile(output_path, mode):
+    if mode == "py-spy":
+        process = subprocess.Popen(["py-spy", "record", "--pid", str(os.getpid()), "--output", output_path, "--threads"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            yield
+        finally:
+            process.send_signal(signal.SIGINT)
+            process.wait(timeout=60)
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(output_path)
@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+import time
+from artifact_cache import _json_default
+from replacements import normalize_whitespace
+from workspace import story_id_for
+
+DEFAULT_VOICES = {"f": "heart", "m": "adam"}
+DEFAULT_SPEED = 1.15
+STYLE_KEYS = {"subtitle_format", "words_per_subtitle", "part_target_seconds"}
+
+# A job is one story to produce:
+#   {"id", "link"} or {"id", "title", "text"}, plus "gender", "voice", "speed" and an optional "style"
+#   dict overriding subtitle_format / words_per_subtitle / part_target_seconds for that story.
+# Manifests list jobs as JSON lines or as a YAML list; a job may give "file" instead of "text".
+
+def make_job(raw, base_dir="."):
+    job = dict(raw)
+    if not job.get("link") and not job.get("title"):
+        raise ValueError(f"Job needs either a link or a title: {raw}")
+    if "file" in job and "text" not in job:
+        with open(os.path.join(base_dir, job.pop("file")), "r", encoding="utf-8") as f:
+            job["text"] = normalize_whitespace(f.read())
+    if not job.get("link") and not job.get("text"):
+        raise ValueError(f"Job '{job['title']}' needs a link, a text or a file.")
+
+    job["gender"] = job.get("gender", "f")
+    if job["gender"] not in DEFAULT_VOICES:
+        raise ValueError(f"Job '{job.get('id') or job.get('title') or job['link']}' has unknown gender '{job['gender']}'. Expected {', '.join(sorted(DEFAULT_VOICES))}.")
+    job["voice"] = job.get("voice") or DEFAULT_VOICES[job["gender"]]
+    job["speed"] = float(job.get("speed", DEFAULT_SPEED))
+    job["style"] = dict(job.get("style") or {})
+    unknown = set(job["style"]) - STYLE_KEYS
+    if unknown:
+        raise ValueError(f"Unknown style options {', '.join(sorted(unknown))}. Expected {', '.join(sorted(STYLE_KEYS))}.")
+    # Local texts are identified by their content, so editing a story file makes it a new job
+    job["id"] = str(job.get("id") or story_id_for(job.get("title", ""), job.get("text") or job.get("link", ""), link=job.get("link")))
+    return job
+
+def load_jobs(path):
+    base_dir = os.path.dirname(os.path.abspath(path))
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("PyYAML is required for YAML manifests: pip install pyyaml")
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or []
+        raw_jobs = data.get("stories", []) if isinstance(data, dict) else data
+    else:
+        raw_jobs = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    raw_jobs.append(json.loads(line))
+                except ValueError as e:
+                    raise ValueError(f"{path}:{line_number}: invalid JSON ({e})")
+
+    jobs = [make_job(raw, base_dir) for raw in raw_jobs]
+    ids = [job["id"] for job in jobs]
+    duplicates = sorted({job_id for job_id in ids if ids.count(job_id) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate job ids in {path}: {', '.join(duplicates)}")
+    return jobs
+
+def jobs_from_env():
+    # The .env layout: STORY_LINK / STORY_TITLE + STORY_FILE for a single story,
+    # the same names suffixed with _1.._N when NUM_OF_STORIES > 1
+    num_of_stories = int(os.getenv("NUM_OF_STORIES", "1"))
+    use_links = os.getenv("USE_LINKS", "false").lower() == "true"
+    jobs = []
+    for i in range(num_of_stories):
+        suffix = f"_{i+1}" if num_of_stories > 1 else ""
+        raw = {"gender": os.getenv(f"NARRATOR_GENDER{suffix}", "f")}
+        if os.getenv(f"NARRATOR_VOICE{suffix}"):
+            raw["voice"] = os.getenv(f"NARRATOR_VOICE{suffix}")
+        if use_links:
+            raw["link"] = os.getenv(f"STORY_LINK{suffix}")
+            if not raw["link"]:
+                raise EnvironmentError(f"STORY_LINK{suffix} environment variable is not set.")
+        else:
+            raw["title"] = os.getenv(f"STORY_TITLE{suffix}")
+            raw["file"] = os.getenv(f"STORY_FILE{suffix}")
+            if not raw["title"] or not raw["file"]:
+                raise EnvironmentError(f"STORY_TITLE{suffix} and STORY_FILE{suffix} environment variables must be set.")
+        jobs.append(make_job(raw))
+    return jobs
+
+def parse_shard(value):
+    try:
+        k, n = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}', expected k/n (e.g. 2/4).")
+    if not 1 <= k <= n:
+        raise ValueError(f"Invalid shard '{value}': k must be between 1 and n.")
+    return k, n
+
+def shard_jobs(jobs, k, n):
+    # Round-robin so every shard gets a similar mix of the manifest
+    return [job for i, job in enumerate(jobs) if i % n == k - 1]
+
+class RunLedger:
+    # Append-only JSONL of finished stages per job: {"job", "stage", "value", "time"}.
+    # Reruns replay it to restore stage outputs and only schedule what is missing.
+    # Lines are appended with a single write so several shards can share one ledger.
+
+    def __init__(self, path, root=None):
+        self.path = path
+        self.root = os.path.abspath(root) if root else None
+        self._lock = threading.Lock()
+        self._entries = {}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash
+                        continue
+                    if entry.get("stage") is None:
+                        self._entries.pop(entry["job"], None)
+                    else:
+                        self._entries.setdefault(entry["job"], {})[entry["stage"]] = entry.get("value")
+
+    def _append(self, entry):
+        line = (json.dumps(entry, ensure_ascii=False, default=_json_default) + "\n").encode("utf-8")
+        with self._lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+    def checkpoint(self, job_id, stage, value):
+        self._append({"job": job_id, "stage": stage, "value": value, "time": time.time()})
+        self._entries.setdefault(job_id, {})[stage] = value
+
+    def reset(self, job_id):
+        self._append({"job": job_id, "stage": None, "time": time.time()})
+        self._entries.pop(job_id, None)
+
+    def _files_exist(self, value):
+        if isinstance(value, dict):
+            return all(self._files_exist(item) for item in value.values())
+        if isinstance(value, list):
+            return all(self._files_exist(item) for item in value)
+        if isinstance(value, str) and self.root and value.startswith(self.root):
+            return os.path.exists(value)
+        return True
+
+    def completed(self, job_id):
+        # Stages whose outputs still exist on disk; anything pointing at a deleted artifact is redone
+        return {stage: value for stage, value in self._entries.get(job_id, {}).items() if self._files_exist(value)}
@@ -0,0 +1,206 @@
+import functools
+import os
+from instrumentation import traced
+from PIL import Image, ImageDraw, ImageFont
+from workspace import atomic_path, file_sha256
+
+FONTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "static", "fonts"))
+RENDERER_VERSION = 2
+
+CARD_WIDTH = 1000
+PADDING = 44
+AVATAR_SIZE = 96
+CORNER_RADIUS = 36
+TITLE_FONT_SIZE = 50
+USERNAME_FONT_SIZE = 38
+BADGE_FONT_SIZE = 34
+LINE_SPACING = 14
+BACKGROUND = (255, 255, 255, 255)
+TEXT_COLOR = (26, 26, 27, 255)
+MUTED_COLOR = (120, 124, 126, 255)
+ACCENT_COLOR = (255, 69, 0, 255)
+
+@functools.lru_cache(maxsize=None)
+def load_font(bold, size):
+    # static/fonts (or FRAME_FONT / FRAME_FONT_BOLD) first, then common system fonts,
+    # then the scalable font that ships with Pillow, so rendering never needs the network
+    names = [os.getenv("FRAME_FONT_BOLD" if bold else "FRAME_FONT")]
+    names += [os.path.join(FONTS_DIR, name) for name in (["Bold.ttf", "Inter-Bold.ttf"] if bold else ["Regular.ttf", "Inter-Regular.ttf"])]
+    names += ["DejaVuSans-Bold.ttf" if bold else "DejaVuSans.ttf", "Arial Bold.ttf" if bold else "Arial.ttf"]
+    for name in names:
+        if not name:
+            continue
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+@functools.lru_cache(maxsize=65536)
+def text_width(bold, size, text):
+    return load_font(bold, size).getlength(text)
+
+def format_count(count):
+    if count >= 1000000:
+        value, suffix = count / 1000000, "M"
+    elif count >= 1000:
+        value, suffix = count / 1000, "k"
+    else:
+        return str(count)
+    return f"{value:.1f}".rstrip("0").rstrip(".") + suffix
+
+def font_source(bold, size):
+    # Which font file load_font resolved to, so cached cards change with FRAME_FONT / static/fonts
+    return getattr(load_font(bold, size), "path", "default")
+
+def break_word(word, bold, size, max_width):
+    # Splits a word wider than the text area (long URLs, "AAAAAAAA...") into pieces that fit
+    pieces = []
+    piece = ""
+    for char in word:
+        if piece and text_width(bold, size, piece + char) > max_width:
+            pieces.append(piece)
+            piece = char
+        else:
+            piece += char
+    if piece:
+        pieces.append(piece)
+    return pieces
+
+def wrap_text(text, bold, size, max_width):
+    lines = []
+    line = ""
+    words = []
+    for word in text.split():
+        words.extend(break_word(word, bold, size, max_width) if text_width(bold, size, word) > max_width else [word])
+    for word in words:
+        candidate = f"{line} {word}" if line else word
+        if not line or text_width(bold, size, candidate) <= max_width:
+            line = candidate
+        else:
+            lines.append(line)
+            line = word
+    if line:
+        lines.append(line)
+    return lines
+
+class LocalRedditFrameImage:
+    # Drop-in replacement for RedditFrameImage that composes the intro card with Pillow:
+    # no browser, no Postfully and no network, so it also works on air-gapped render nodes.
+
+    def __init__(self, avatar_path, result_folder, cache=None, username="Massive Ideas"):
+        self.avatar_path = avatar_path
+        self.result_folder = result_folder
+        self.cache = cache
+        self.username = username
+        self._header = None
+        self._icons = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def start(self):
+        self._get_header()
+        self._get_icons()
+
+    def close(self):
+        pass
+
+    def _get_header(self):
+        # Avatar and username never change between stories, so the header strip is drawn once
+        if self._header is None:
+            header = Image.new("RGBA", (CARD_WIDTH - 2 * PADDING, AVATAR_SIZE), (0, 0, 0, 0))
+            avatar = Image.open(self.avatar_path).convert("RGBA").resize((AVATAR_SIZE, AVATAR_SIZE), Image.LANCZOS)
+            mask = Image.new("L", (AVATAR_SIZE, AVATAR_SIZE), 0)
+            ImageDraw.Draw(mask).ellipse((0, 0, AVATAR_SIZE - 1, AVATAR_SIZE - 1), fill=255)
+            header.paste(avatar, (0, 0), mask)
+
+            draw = ImageDraw.Draw(header)
+            font = load_font(True, USERNAME_FONT_SIZE)
+            draw.text((AVATAR_SIZE + 24, AVATAR_SIZE // 2), self.username, font=font, fill=TEXT_COLOR, anchor="lm")
+            self._header = header
+        return self._header
+
+    def _get_icons(self):
+        if self._icons is None:
+            size = BADGE_FONT_SIZE
+            upvote = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+            ImageDraw.Draw(upvote).polygon([
+                (size * 0.5, 0), (size, size * 0.5), (size * 0.68, size * 0.5),
+                (size * 0.68, size), (size * 0.32, size), (size * 0.32, size * 0.5), (0, size * 0.5),
+            ], fill=ACCENT_COLOR)
+
+            comment = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+            draw = ImageDraw.Draw(comment)
+            draw.rounded_rectangle((2, 2, size - 2, size * 0.78), radius=size // 4, outline=MUTED_COLOR, width=3)
+            draw.polygon([(size * 0.25, size * 0.76), (size * 0.25, size), (size * 0.5, size * 0.76)], fill=MUTED_COLOR)
+            self._icons = {"upvote": upvote, "comment": comment}
+        return self._icons
+
+    def render(self, text, upvotes=67000, comments=4100):
+        text_area = CARD_WIDTH - 2 * PADDING
+        lines = wrap_text(text, True, TITLE_FONT_SIZE, text_area)
+        title_font = load_font(True, TITLE_FONT_SIZE)
+        badge_font = load_font(True, BADGE_FONT_SIZE)
+        line_height = TITLE_FONT_SIZE + LINE_SPACING
+
+        header = self._get_header()
+        icons = self._get_icons()
+
+        title_top = PADDING + AVATAR_SIZE + 28
+        footer_top = title_top + len(lines) * line_height + 24
+        height = footer_top + BADGE_FONT_SIZE + PADDING
+
+        card = Image.new("RGBA", (CARD_WIDTH, height), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(card)
+        draw.rounded_rectangle((0, 0, CARD_WIDTH - 1, height - 1), radius=CORNER_RADIUS, fill=BACKGROUND)
+        card.alpha_composite(header, (PADDING, PADDING))
+
+        for i, line in enumerate(lines):
+            draw.text((PADDING, title_top + i * line_height), line, font=title_font, fill=TEXT_COLOR)
+
+        x = PADDING
+        for icon, label in (("upvote", format_count(upvotes)), ("comment", format_count(comments))):
+            card.alpha_composite(icons[icon], (x, footer_top))
+            x += BADGE_FONT_SIZE + 12
+            draw.text((x, footer_top + BADGE_FONT_SIZE // 2), label, font=badge_font, fill=MUTED_COLOR, anchor="lm")
+            x += int(text_width(True, BADGE_FONT_SIZE, label)) + 48
+        return card
+
+    @traced("frame.render_local")
+    def download_frame_image(self, text, upvotes=67000, comments=4100, filename="reddit_frame_image.png", output_path=None):
+        filepath = output_path or os.path.join(self.result_folder, filename)
+
+        def create():
+            card = self.render(text, upvotes, comments)
+            with atomic_path(filepath) as tmp_path:
+                card.save(tmp_path, format="PNG")
+            return {}
+
+        if self.cache is None:
+            create()
+        else:
+            fonts = [font_source(True, size) for size in (TITLE_FONT_SIZE, USERNAME_FONT_SIZE, BADGE_FONT_SIZE)]
+            key = self.cache.key("frame_image_local", RENDERER_VERSION, text, upvotes, comments, file_sha256(self.avatar_path), self.username, fonts)
+            self.cache.fetch_or_create("frame_image_local", key, filepath, create)
+        return filepath
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    RESULTS_DIR = os.getenv("RESULTS_DIR", "results")
+    AVATAR_PATH = os.getenv("AVATAR_PATH", "avatar.png")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+
+    reddit_frame_image = LocalRedditFrameImage(avatar_path=AVATAR_PATH, result_folder=RESULTS_DIR)
+    result_image_path = reddit_frame_image.download_frame_image(
+        text="This is an example Reddit post rendered locally without a browser.",
+        upvotes=12345,
+        comments=678
+    )
+    print(f"Reddit frame image saved at: {result_image_path}")
@@ -1,185 +1,107 @@
-import re
-import sys
+import argparse
 from dotenv import load_dotenv
 import os
 import time
 
-from tts import TTS
-from tiktok_video_generator import TikTokVideoGenerator
-from subtitles import Subtitles
-from reddit_frame_image import RedditFrameImage
 from reddit_story_fetcher import fetch_reddit_data
-from caption import generate_caption
+from story_harvester import StoryHarvester
+from job_manifest import DEFAULT_SPEED, jobs_from_env, load_jobs, make_job, parse_shard, shard_jobs
+from story_runner import StoryRunner
 
 load_dotenv()
 
-def test():
+def test(manifest=None):
     REQUIRED_VARS = ["AVATAR_PATH", "VECTCUT_DIR", "BG_VIDEO"]
     for var_name in REQUIRED_VARS:
         if not os.getenv(var_name):
             raise EnvironmentError(f"{var_name} environment variable is not set.")
-    
-    NUM_OF_STORIES = int(os.getenv("NUM_OF_STORIES", "1"))
-    USE_LINKS = os.getenv("USE_LINKS", "false").lower() == "true"
-    
+
+    jobs = load_jobs(manifest) if manifest else jobs_from_env()
     processed_stories = 0
 
-    for i in range(NUM_OF_STORIES):
-        if USE_LINKS:
-            STORY_LINK = os.getenv(f"STORY_LINK_{i+1}") if NUM_OF_STORIES > 1 else os.getenv("STORY_LINK")
-            if not STORY_LINK:
-                raise EnvironmentError("STORY_LINK environment variable is not set.")
+    for job in jobs:
+        if "text" in job:
+            story_title, story_text = job["title"], job["text"]
+        else:
             try:
-                STORY_TITLE, story_text = fetch_reddit_data(STORY_LINK)
-            except Exception:
+                story_title, story_text = fetch_reddit_data(job["link"])
+            except Exception as e:
+                print(f"Failed to fetch {job['link']}: {str(e)}")
                 continue
-        else:
-            STORY_TITLE = os.getenv(f"STORY_TITLE_{i+1}") if NUM_OF_STORIES > 1 else os.getenv("STORY_TITLE")
-            STORY_FILE = os.getenv(f"STORY_FILE_{i+1}") if NUM_OF_STORIES > 1 else os.getenv("STORY_FILE")
-            print("Reading story text...")
-            with open(STORY_FILE, "r", encoding="utf-8") as f:
-                story_text = f.read()
-            story_text = re.sub(r"\s*\r?\n\s*", " ", story_text).strip()
-
-        NARRATOR_GENDER = os.getenv(f"NARRATOR_GENDER_{i+1}", "f") if NUM_OF_STORIES > 1 else os.getenv("NARRATOR_GENDER", "f")
-        NARRATOR_VOICE = os.getenv(f"NARRATOR_VOICE_{i+1}", "heart") if NUM_OF_STORIES > 1 else os.getenv("NARRATOR_VOICE", "heart")
-
-        print("STORY TITLE:", STORY_TITLE)
-        print("NARRATOR: ", NARRATOR_GENDER, NARRATOR_VOICE)
+
+        print("STORY TITLE:", story_title)
+        print("NARRATOR: ", job["gender"], job["voice"], f"(speed {job['speed']})")
         print("STORY TEXT:", story_text[:100] + "..." if len(story_text) > 100 else story_text)
         processed_stories += 1
-    
+
     print(f"Successfully processed {processed_stories} stories.")
 
-def main():
+def main(manifest=None, shard=None, fresh=False):
     start = time.perf_counter()
 
-    REQUIRED_VARS = ["AVATAR_PATH", "VECTCUT_DIR", "BG_VIDEO"]
-    for var_name in REQUIRED_VARS:
-        if not os.getenv(var_name):
-            raise EnvironmentError(f"{var_name} environment variable is not set.")
-
-    RESULTS_DIR = os.getenv("RESULTS_DIR", "results")
-
     NUM_OF_STORIES = int(os.getenv("NUM_OF_STORIES", "1"))
-    USE_LINKS = os.getenv("USE_LINKS", "false").lower() == "true"
-
-    HASHTAGS = "#fyp #foryou #reddit #redditstories #fullystory #storytime #redditreadings #reddit_tiktok"
-
-    POSTFULLY_URL = os.getenv("POSTFULLY_URL", "https://postfully.app/tools/reddit-post-template/")
-    AVATAR_PATH = os.getenv("AVATAR_PATH")
-
-    VECTCUT_DIR = os.getenv("VECTCUT_DIR")
-    VECTCUT_PORT = os.getenv("VECTCUT_PORT", "9001")
-    BG_VIDEO = os.getenv("BG_VIDEO")
 
     try:
-        subtitles_generator = Subtitles(result_folder=RESULTS_DIR, device="cpu", compute_type="int8")
-        generator = TikTokVideoGenerator(api_url=f"http://localhost:{VECTCUT_PORT}", vectcut_dir=VECTCUT_DIR)
-        reddit_frame_image_generator = RedditFrameImage(postfully_url=POSTFULLY_URL, avatar_path=AVATAR_PATH, result_folder=RESULTS_DIR)
+        runner = StoryRunner()
+    except EnvironmentError:
+        raise
     except Exception as e:
         print(f"Failed to initialize components: {str(e)}")
         return
-    
-    os.makedirs(RESULTS_DIR, exist_ok=True)
-
-    captions = []
-
-    for i in range(NUM_OF_STORIES):
-        if USE_LINKS:
-            STORY_LINK = os.getenv(f"STORY_LINK_{i+1}") if NUM_OF_STORIES > 1 else os.getenv("STORY_LINK")
-            if not STORY_LINK:
-                raise EnvironmentError("STORY_LINK environment variable is not set.")
-            try:
-                story_title, story_text = fetch_reddit_data(STORY_LINK)
-            except Exception:
-                continue
-        else:
-            story_title = os.getenv(f"STORY_TITLE_{i+1}") if NUM_OF_STORIES > 1 else os.getenv("STORY_TITLE")
-            STORY_FILE = os.getenv(f"STORY_FILE_{i+1}") if NUM_OF_STORIES > 1 else os.getenv("STORY_FILE")
-            print("Reading story text...")
-            with open(STORY_FILE, "r", encoding="utf-8") as f:
-                story_text = f.read()
-            story_text = re.sub(r"\s*\r?\n\s*", " ", story_text).strip()
-
-        NARRATOR_GENDER = os.getenv(f"NARRATOR_GENDER_{i+1}", "f") if NUM_OF_STORIES > 1 else os.getenv("NARRATOR_GENDER", "f")
-        NARRATOR_VOICE = os.getenv(f"NARRATOR_VOICE_{i+1}", "heart" if NARRATOR_GENDER == "f" else "adam") if NUM_OF_STORIES > 1 else os.getenv("NARRATOR_VOICE", "heart" if NARRATOR_GENDER == "f" else "adam")
 
+    try:
+        HARVEST_SUBREDDITS = [sub.strip() for sub in os.getenv("HARVEST_SUBREDDITS", "").split(",") if sub.strip()]
         try:
-            print(f"Starting generation for TikTok video ({i+1}) {story_title}:\n")
-
-            tts = TTS(result_folder=RESULTS_DIR, gender=NARRATOR_GENDER, voice=NARRATOR_VOICE)
-            print("Generating voice audio from story title and text...")
-
-            title_audio_file_wav, title_audio_duration = tts.synthesize(story_title, name="title")
-            title_audio_file_wav, title_audio_duration = tts.trim_silence(title_audio_file_wav)
-            title_audio_file = tts.convert_wav_to_mp3(title_audio_file_wav)
-            title_audio_file = tts.add_fade(title_audio_file, fade_in_duration=200, fade_out_duration=0)
-
-            voice_audio_file_wav, voice_audio_duration = tts.synthesize(story_text, name="voice")
-            voice_audio_file_wav, voice_audio_duration = tts.trim_silence(voice_audio_file_wav)
-            voice_audio_file = tts.convert_wav_to_mp3(voice_audio_file_wav)
-
-            hook_duration = 0.3 # seconds
-            mid_silence_duration = 0.4  # seconds
-
-            initial_image_path = reddit_frame_image_generator.download_frame_image(text=story_title)
-
-            total_intro_duration = title_audio_duration + mid_silence_duration + hook_duration
-            intro_duration_no_silence = title_audio_duration + hook_duration
-
-            print("Generating TikTok video project...")
-            generator.create_project(width=1080, height=1920)
-
-            print("Adding background video...")
-            generator.add_background_video(video_path=BG_VIDEO, volume=0, speed=1.0, track_name="main", duration=total_intro_duration + voice_audio_duration)
-
-            print("Adding initial image...")
-            generator.add_initial_image(image_path=initial_image_path, duration=intro_duration_no_silence)
-
-            print("Adding engaging hook audio...")
-            hook_audio_path = os.path.abspath(os.path.join("static", "engaging-hook.mp3"))
-            generator.add_audio(audio_path=hook_audio_path, volume=0.3, track_name="hook", target_start=0)
-
-            print("Adding ding sound...")
-            ding_path = os.path.abspath(os.path.join("static", "ding.mp3"))
-            generator.add_audio(audio_path=ding_path, volume=1.0, track_name="ding", target_start=0.07)
-
-            print("Adding title audio...")
-            generator.add_audio(audio_path=title_audio_file, volume=1.0, track_name="title", target_start=hook_duration)
-
-            print("Adding voice audio...")
-            generator.add_audio(audio_path=voice_audio_file, volume=1.0, track_name="voice", target_start=total_intro_duration)
-
-            subs = subtitles_generator.transcribe(voice_audio_file_wav)
-            subs_srt = os.path.join(RESULTS_DIR, "subtitles.srt")
-            subtitles_generator.generate_srt(subs, subs_srt, words_per_subtitle=1, audio_duration=voice_audio_duration)
-            print("Adding subtitles...")
-            generator.add_subtitles(
-                srt_url=subs_srt,
-                font_size=36,
-                font_color="#FFFFFF",
-                transform_y=-0.05,
-                time_offset=total_intro_duration,
-            )
+            if manifest:
+                jobs = load_jobs(manifest)
+                ledger_name = os.path.splitext(os.path.basename(manifest))[0]
+            elif HARVEST_SUBREDDITS:
+                # The listings already carry title and text, so harvested stories skip the per-link fetch
+                harvester = StoryHarvester(
+                    runner.reddit_fetcher,
+                    produced_ids=runner.workspace.produced_ids(),
+                    min_score=int(os.getenv("HARVEST_MIN_SCORE", "100")),
+                    min_duration=float(os.getenv("HARVEST_MIN_SECONDS", "45")),
+                    max_duration=float(os.getenv("HARVEST_MAX_SECONDS", "600")),
+                    allow_nsfw=os.getenv("HARVEST_ALLOW_NSFW", "false").lower() == "true",
+                    speed=DEFAULT_SPEED,
+                )
+                candidates = harvester.harvest(HARVEST_SUBREDDITS, NUM_OF_STORIES, time_filter=os.getenv("HARVEST_TIME", "day"))
+                print(f"Harvested {len(candidates)} of {NUM_OF_STORIES} stories from r/{', r/'.join(HARVEST_SUBREDDITS)}")
+                for candidate in candidates:
+                    print(f"- {candidate['title']} (score {candidate['score']}, ~{candidate['estimated_duration']:.0f}s)")
+                jobs = [make_job(candidate) for candidate in candidates]
+                ledger_name = "harvest"
+            else:
+                jobs = jobs_from_env()
+                ledger_name = "env"
+        except Exception as e:
+            print(f"Failed to load stories: {str(e)}")
+            return
 
-            result = generator.save_and_import_to_capcut(auto_copy=True)
+        if shard:
+            jobs = shard_jobs(jobs, *shard)
+            ledger_name = f"{ledger_name}.shard{shard[0]}of{shard[1]}"
+            print(f"Shard {shard[0]}/{shard[1]}: {len(jobs)} stories")
 
-            if result.get("success"):
-                print("TikTok video project generated and imported to CapCut successfully.")
-            else:
-                print(f"Failed to generate TikTok video project: {result.get('error')}")
+        outcomes = runner.run(jobs, runner.open_ledger(ledger_name), fresh=fresh)
+    finally:
+        runner.close()
 
-            caption = generate_caption(story_title, HASHTAGS, max_length=150)
-            captions.append(caption)
-        except Exception as e:
-            print(f"An error occurred: {str(e)}")
-            print("Troubleshooting:")
-            print(f"- Ensure the required environment variables are set correctly: {', '.join(REQUIRED_VARS)}")
-            print("- Ensure the VectCut API server is running")
-            print("- Make sure all file paths are correct.")
-            print("- Verify FFmpeg is available.")
-            print("- Make sure CapCut is installed")
+    captions = []
+    for i, outcome in enumerate(outcomes):
+        captions.extend(outcome["captions"])
+        if outcome["status"] != "failed":
+            continue
+        print(f"Story {i + 1} failed at stage '{outcome['stage']}': {outcome['error']}")
+        print("Troubleshooting:")
+        print(f"- Ensure the required environment variables are set correctly: {', '.join(runner.required_vars)}")
+        print("- Ensure the VectCut API server is running")
+        print("- Make sure all file paths are correct.")
+        print("- Verify FFmpeg is available.")
+        print("- Make sure CapCut is installed")
+
+    runner.print_stats()
 
     end = time.perf_counter()
     print(f"Total execution time: {end - start:.2f} seconds")
@@ -189,7 +111,14 @@ def main():
         print(f"Video {i} Caption: {caption}")
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1 and sys.argv[1] == "test":
-        test()
+    parser = argparse.ArgumentParser(description="Generate TikTok videos from Reddit stories.")
+    parser.add_argument("mode", nargs="?", choices=["run", "test"], default="run", help="'test' only fetches and prints the stories")
+    parser.add_argument("--manifest", default=os.getenv("JOB_MANIFEST"), help="JSONL or YAML job manifest (default: stories from .env)")
+    parser.add_argument("--shard", type=parse_shard, help="only run every n-th story of the manifest, starting at the k-th (k/n)")
+    parser.add_argument("--fresh", action="store_true", help="ignore the run ledger and redo every stage")
+    args = parser.parse_args()
+
+    if args.mode == "test":
+        test(args.manifest)
     else:
-        main()
\ No newline at end of file
+        main(args.manifest, args.shard, args.fresh)
\ No newline at end of file
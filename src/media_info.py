@@ -0,0 +1,213 @@
+import contextlib
+import json
+import os
+import random
+import subprocess
+import threading
+from workspace import FileLock, write_json_atomic
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".webm")
+
+def list_videos(spec):
+    # BG_VIDEO may be a single file, a comma-separated list of files, or a directory of videos
+    videos = []
+    for item in (part.strip() for part in spec.split(",")):
+        if not item:
+            continue
+        if os.path.isdir(item):
+            videos.extend(sorted(os.path.join(item, name) for name in os.listdir(item) if name.lower().endswith(VIDEO_EXTENSIONS)))
+        else:
+            videos.append(item)
+    return [os.path.abspath(video) for video in videos]
+
+class MediaInfoCache:
+    # ffprobe results keyed by path + mtime + size, kept in memory and persisted as JSON between runs.
+    # The file may be shared by several processes: writes happen under a file lock after merging in
+    # what the others saved, and used segments always come from disk.
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(path) if path else threading.RLock()
+        self._data = {"media": {}, "segments": {}}
+        self._dropped = set()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._data.update(json.load(f))
+
+    def _merge_from_disk(self):
+        # Caller holds the file lock
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            disk = json.load(f)
+        with self._lock:
+            media = disk.get("media", {})
+            media.update(self._data["media"])
+            for key in self._dropped:
+                media.pop(key, None)
+            self._data = {"media": media, "segments": disk.get("segments", {})}
+
+    def _write(self):
+        with self._lock:
+            data = json.loads(json.dumps(self._data))
+        write_json_atomic(self.path, data)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._file_lock:
+            self._merge_from_disk()
+            self._write()
+
+    @contextlib.contextmanager
+    def segments_lock(self):
+        # Hold while reading and then updating used segments, so processes sharing the file never hand
+        # out the same footage
+        with self._file_lock:
+            self._merge_from_disk()
+            yield
+
+    @staticmethod
+    def _key(path):
+        stat = os.stat(path)
+        return f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}"
+
+    def _probe(self, path):
+        try:
+            result = subprocess.run(
+                ["ffprobe", "-v", "error", "-show_format", "-show_streams", "-of", "json", path],
+                capture_output=True,
+                text=True,
+                check=True
+            )
+            info = json.loads(result.stdout)
+            streams = [{
+                "index": stream.get("index"),
+                "codec_type": stream.get("codec_type"),
+                "codec_name": stream.get("codec_name"),
+                "width": stream.get("width"),
+                "height": stream.get("height"),
+                "sample_rate": stream.get("sample_rate"),
+                "r_frame_rate": stream.get("r_frame_rate"),
+            } for stream in info.get("streams", [])]
+            return {
+                "duration": float(info["format"]["duration"]),
+                "format": info["format"].get("format_name"),
+                "streams": streams,
+            }
+        except subprocess.CalledProcessError as e:
+            raise Exception(f"Failed to probe media file: {str(e)}")
+        except (KeyError, ValueError, json.JSONDecodeError) as e:
+            raise Exception(f"Error parsing ffprobe output: {str(e)}")
+
+    def _probe_keyframes(self, path):
+        # Packet flags come from the demuxer, so no frames are decoded
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        keyframes = []
+        for line in result.stdout.splitlines():
+            pts_time, _, flags = line.partition(",")
+            if "K" in flags and pts_time not in ("", "N/A"):
+                keyframes.append(round(float(pts_time), 3))
+        return sorted(keyframes)
+
+    def get(self, path, keyframes=False):
+        key = self._key(path)
+        with self._lock:
+            info = self._data["media"].get(key)
+        if info is None:
+            info = self._probe(path)
+        if keyframes and "keyframes" not in info:
+            has_video = any(stream["codec_type"] == "video" for stream in info["streams"])
+            info = dict(info, keyframes=self._probe_keyframes(path) if has_video else [])
+        with self._lock:
+            changed = self._data["media"].get(key) is not info
+            if changed:
+                # Drop entries for older versions of the same file
+                prefix = key.rsplit("|", 2)[0] + "|"
+                for stale in [k for k in self._data["media"] if k.startswith(prefix) and k != key]:
+                    del self._data["media"][stale]
+                    self._dropped.add(stale)
+            self._data["media"][key] = info
+        if changed:
+            self.save()
+        return info
+
+    def duration(self, path):
+        return self.get(path)["duration"]
+
+    def used_segments(self, path):
+        with self._lock:
+            return [tuple(segment) for segment in self._data["segments"].get(os.path.abspath(path), [])]
+
+    def set_used_segments(self, path, segments):
+        with self._file_lock:
+            self._merge_from_disk()
+            with self._lock:
+                self._data["segments"][os.path.abspath(path)] = [list(segment) for segment in segments]
+            if self.path:
+                self._write()
+
+class BackgroundVideoPool:
+    # Picks background segments across several long videos so successive stories don't reuse the same footage
+
+    def __init__(self, videos, media_info, skip_start=5):
+        if not videos:
+            raise ValueError("At least one background video is required.")
+        self.videos = list(videos)
+        self.media_info = media_info
+        self.skip_start = skip_start
+        self._lock = threading.Lock()
+
+    def _free_ranges(self, path, video_duration):
+        ranges = []
+        cursor = self.skip_start
+        for start, end in sorted(self.media_info.used_segments(path)):
+            if start > cursor:
+                ranges.append((cursor, start))
+            cursor = max(cursor, end)
+        if video_duration > cursor:
+            ranges.append((cursor, video_duration))
+        return ranges
+
+    def _snap_to_keyframe(self, keyframes, start, latest_start):
+        # Starting on a keyframe keeps seeking cheap for whichever backend cuts the clip
+        for keyframe in keyframes:
+            if start <= keyframe <= latest_start:
+                return keyframe
+            if keyframe > latest_start:
+                break
+        return start
+
+    def pick(self, duration):
+        with self._lock, self.media_info.segments_lock():
+            candidates = []
+            for path in self.videos:
+                info = self.media_info.get(path, keyframes=True)
+                for free_start, free_end in self._free_ranges(path, info["duration"]):
+                    if free_end - free_start >= duration:
+                        candidates.append((path, free_start, free_end, info))
+
+            if not candidates:
+                # Every video is used up for this length: start over on the longest one
+                path = max(self.videos, key=self.media_info.duration)
+                self.media_info.set_used_segments(path, [])
+                info = self.media_info.get(path, keyframes=True)
+                free_end = info["duration"]
+                if free_end - self.skip_start < duration:
+                    duration = free_end - self.skip_start
+                candidates = [(path, self.skip_start, free_end, info)]
+
+            weights = [free_end - free_start - duration + 1 for _, free_start, free_end, _ in candidates]
+            path, free_start, free_end, info = random.choices(candidates, weights=weights)[0]
+            latest_start = free_end - duration
+            start = self._snap_to_keyframe(info.get("keyframes", []), random.uniform(free_start, latest_start), latest_start)
+            end = start + duration
+
+            self.media_info.set_used_segments(path, self.media_info.used_segments(path) + [(round(start, 3), round(end, 3))])
+            return path, start, end
@@ -0,0 +1,124 @@
+import concurrent.futures as cf
+import traceback
+
+class Stage:
+    def __init__(self, name, func, deps=(), pool="cpu"):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.pool = pool
+
+class StoryResult:
+    def __init__(self, index, context):
+        self.index = index
+        self.context = context
+        self.completed = []
+        self.error = None
+        self.failed_stage = None
+
+    @property
+    def success(self):
+        return self.error is None
+
+# Runs a per-story stage graph over bounded worker pools (one pool per resource).
+# Each stage gets the story context dict and its return value is stored in the context
+# under the stage name. A failing stage only stops the remaining stages of its own story.
+# Stages already finished in an earlier run can be passed in `completed` (their values must
+# already be in the context); stages only needed to produce those are skipped as well.
+class StagePipeline:
+
+    def __init__(self, stages, pool_sizes=None):
+        names = [stage.name for stage in stages]
+        if len(set(names)) != len(names):
+            raise ValueError("Stage names must be unique.")
+        for stage in stages:
+            for dep in stage.deps:
+                if dep not in names:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'.")
+        self.stages = self._sorted(stages)
+        self.pool_sizes = dict(pool_sizes or {})
+
+    def _sorted(self, stages):
+        ordered = []
+        done = set()
+        remaining = list(stages)
+        while remaining:
+            ready = [stage for stage in remaining if all(dep in done for dep in stage.deps)]
+            if not ready:
+                raise ValueError("Stage dependencies contain a cycle.")
+            for stage in ready:
+                ordered.append(stage)
+                done.add(stage.name)
+                remaining.remove(stage)
+        return ordered
+
+    def _skipped(self, completed):
+        # Walk from the last stage back: a stage is needed if it isn't done and either nothing
+        # depends on it or something still needed does
+        needed = set()
+        for stage in reversed(self.stages):
+            if stage.name in completed:
+                continue
+            dependents = [other for other in self.stages if stage.name in other.deps]
+            if not dependents or any(other.name in needed for other in dependents):
+                needed.add(stage.name)
+        return [stage.name for stage in self.stages if stage.name not in needed]
+
+    def run(self, contexts, completed=None, on_complete=None):
+        pools = {stage.pool for stage in self.stages}
+        executors = {
+            pool: cf.ThreadPoolExecutor(max_workers=max(1, int(self.pool_sizes.get(pool, 1))), thread_name_prefix=pool)
+            for pool in pools
+        }
+        results = [StoryResult(i, context) for i, context in enumerate(contexts)]
+        submitted = [set() for _ in results]
+        for result, done in zip(results, completed or []):
+            result.completed = self._skipped(set(done))
+            submitted[result.index].update(result.completed)
+        pending = {}
+
+        def submit_ready(result):
+            if result.error is not None:
+                return
+            for stage in self.stages:
+                if stage.name in submitted[result.index]:
+                    continue
+                if all(dep in result.completed for dep in stage.deps):
+                    future = executors[stage.pool].submit(stage.func, result.context)
+                    pending[future] = (result, stage)
+                    submitted[result.index].add(stage.name)
+
+        try:
+            for result in results:
+                submit_ready(result)
+
+            while pending:
+                done, _ = cf.wait(pending, return_when=cf.FIRST_COMPLETED)
+                for future in done:
+                    result, stage = pending.pop(future)
+                    try:
+                        value = future.result()
+                    except Exception as e:
+                        result.error = e
+                        result.failed_stage = stage.name
+                        print(f"Story {result.index + 1} failed at stage '{stage.name}': {str(e)}")
+                        traceback.print_exc()
+                        continue
+                    result.context[stage.name] = value
+                    result.completed.append(stage.name)
+                    if on_complete is not None:
+                        # A failing callback (e.g. a checkpoint that can't be written) only fails its own story
+                        try:
+                            on_complete(result, stage.name, value)
+                        except Exception as e:
+                            result.error = e
+                            result.failed_stage = stage.name
+                            print(f"Story {result.index + 1} failed after stage '{stage.name}': {str(e)}")
+                            traceback.print_exc()
+                            continue
+                    submit_ready(result)
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        return results
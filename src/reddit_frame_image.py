@@ -1,46 +1,145 @@
+import asyncio
 import os
-from playwright.sync_api import sync_playwright
+import threading
+from instrumentation import traced
+from workspace import atomic_path, file_sha256
+
+RENDERER_VERSION = 1
 
 class RedditFrameImage:
-    def __init__(self, postfully_url, avatar_path, result_folder):
+    # Keeps one headless Chromium with a pool of Postfully pages warm (avatar and username already set),
+    # so each render only refills the title, upvote and comment fields. Playwright runs on its own
+    # event loop thread, which lets several pipeline workers share the pool.
+
+    def __init__(self, postfully_url, avatar_path, result_folder, cache=None, pool_size=1, headless=True, username="Massive Ideas"):
         self.postfully_url = postfully_url
         self.avatar_path = avatar_path
         self.result_folder = result_folder
-
-    def download_frame_image(self, text, upvotes=67000, comments=4100):
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
-            page = browser.new_page()
-
-            page.goto(self.postfully_url)
-
-            page.wait_for_load_state("networkidle")
-
-            avatar_input = page.locator("input[name='avatar']")
-            avatar_input.set_input_files(self.avatar_path)
-
-            username_input = page.locator("input[name='username']")
-            username_input.fill("Massive Ideas")
-
-            text_input = page.locator("textarea[name='text']")
-            text_input.fill(text)
-
-            upvotes_input = page.locator("input[name='upvoteCount']")
-            upvotes_input.fill(str(upvotes))
-
-            comments_input = page.locator("input[name='commentCount']")
-            comments_input.fill(str(comments))
-
-            generate_button = page.locator("button:has-text('Download')")
-            
-            with page.expect_download() as download_info:
-                generate_button.click()
-
-            download = download_info.value
-            filepath = os.path.join(self.result_folder, "reddit_frame_image.png")
-            download.save_as(filepath)
-
-            browser.close()
+        self.cache = cache
+        self.pool_size = max(1, pool_size)
+        self.headless = headless
+        self.username = username
+        self._loop = None
+        self._thread = None
+        self._playwright = None
+        self._browser = None
+        self._pages = None
+        self._start_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def start(self):
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="reddit-frame-renderer", daemon=True)
+            self._thread.start()
+            try:
+                self._run(self._launch())
+            except Exception:
+                # A page that fails to open leaves the browser and playwright running; close them first
+                try:
+                    self._run(self._shutdown())
+                except Exception:
+                    pass
+                self._browser = None
+                self._playwright = None
+                self._pages = None
+                self._stop_loop()
+                raise
+
+    async def _launch(self):
+        # Imported here so importing this module (and main.py's test mode) doesn't load playwright
+        from playwright.async_api import async_playwright
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=self.headless)
+        self._pages = asyncio.Queue()
+        for page in await asyncio.gather(*(self._open_page() for _ in range(self.pool_size))):
+            self._pages.put_nowait(page)
+
+    async def _open_page(self):
+        page = await self._browser.new_page()
+        await page.goto(self.postfully_url)
+        await page.wait_for_load_state("networkidle")
+        await page.locator("input[name='avatar']").set_input_files(self.avatar_path)
+        await page.locator("input[name='username']").fill(self.username)
+        return page
+
+    async def _render(self, text, upvotes, comments, filepath):
+        # None in the pool marks a page that broke and has to be reopened
+        page = await self._pages.get()
+        try:
+            if page is None:
+                page = await self._open_page()
+
+            await page.locator("textarea[name='text']").fill(text)
+            await page.locator("input[name='upvoteCount']").fill(str(upvotes))
+            await page.locator("input[name='commentCount']").fill(str(comments))
+
+            async with page.expect_download() as download_info:
+                await page.locator("button:has-text('Download')").click()
+
+            download = await download_info.value
+            with atomic_path(filepath) as tmp_path:
+                await download.save_as(tmp_path)
+        except Exception:
+            if page is not None:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+            page = None
+            raise
+        finally:
+            self._pages.put_nowait(page)
+
+    async def _shutdown(self):
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+
+    def _stop_loop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+        self._thread = None
+
+    def close(self):
+        with self._start_lock:
+            if self._loop is None:
+                return
+            try:
+                self._run(self._shutdown())
+            finally:
+                self._browser = None
+                self._playwright = None
+                self._pages = None
+                self._stop_loop()
+
+    @traced("frame.download_frame_image")
+    def download_frame_image(self, text, upvotes=67000, comments=4100, filename="reddit_frame_image.png", output_path=None):
+        filepath = output_path or os.path.join(self.result_folder, filename)
+
+        def create():
+            self.start()
+            self._run(self._render(text, upvotes, comments, filepath))
+            return {}
+
+        if self.cache is None:
+            create()
+        else:
+            key = self.cache.key("frame_image", RENDERER_VERSION, text, upvotes, comments, file_sha256(self.avatar_path), self.username, self.postfully_url)
+            self.cache.fetch_or_create("frame_image", key, filepath, create)
         return filepath
 
 if __name__ == "__main__":
@@ -53,10 +152,10 @@ if __name__ == "__main__":
 
     os.makedirs(RESULTS_DIR, exist_ok=True)
 
-    reddit_frame_image = RedditFrameImage(postfully_url=POSTFULLY_URL, avatar_path=AVATAR_PATH, result_folder=RESULTS_DIR)
-    result_image_path = reddit_frame_image.download_frame_image(
-        text="This is an example Reddit post generated using Playwright automation.",
-        upvotes=12345,
-        comments=678
-    )
+    with RedditFrameImage(postfully_url=POSTFULLY_URL, avatar_path=AVATAR_PATH, result_folder=RESULTS_DIR) as reddit_frame_image:
+        result_image_path = reddit_frame_image.download_frame_image(
+            text="This is an example Reddit post generated using Playwright automation.",
+            upvotes=12345,
+            comments=678
+        )
     print(f"Reddit frame image saved at: {result_image_path}")
\ No newline at end of file
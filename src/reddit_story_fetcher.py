@@ -1,17 +1,250 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit
 import requests
+from requests.adapters import HTTPAdapter
+from workspace import write_json_atomic
+
+USER_AGENT = "python:reddit_fetcher:v1.0 (by /u/lllAlexxinolll)"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MODES = ("live", "record", "offline")
+
+def json_url(link):
+    # The post's JSON lives at <path>.json; share links carry ?utm_... and #fragments, which are dropped
+    scheme, netloc, path, _, _ = urlsplit(link)
+    return urlunsplit((scheme, netloc, f"{path.rstrip('/')}.json", "", ""))
+
+class TokenBucket:
+    # Paces requests to `rate` per second with bursts up to `capacity`.
+    # Reddit's X-Ratelimit-* headers re-tune the rate so the remaining quota lasts until the window resets.
+
+    def __init__(self, rate=1.0, capacity=5):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def update(self, remaining, reset):
+        with self.lock:
+            self._refill()
+            if remaining <= 1:
+                # Quota exhausted: hold everyone until the window resets. Every worker gets the same
+                # answer, so the wait is set rather than added to, and a longer pause already in place is kept.
+                self.tokens = min(self.tokens, -reset * self.rate)
+            else:
+                self.rate = max(remaining / max(reset, 1.0), 0.05)
+                self.tokens = min(self.tokens, remaining)
+
+    def pause(self, seconds):
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+class RedditFetcher:
+    # Fetches Reddit post JSON over one pooled session.
+    # mode="live" uses the network with an on-disk cache revalidated through ETag/Last-Modified,
+    # mode="record" does the same and also saves every response as a fixture,
+    # mode="offline" only reads the fixtures and never touches the network.
+
+    def __init__(self, cache_dir=None, fixtures_dir=None, mode="live", max_workers=4, timeout=(5, 30), retries=3, backoff=1.0, cache_ttl=24 * 3600, requests_per_second=1.0, user_agent=USER_AGENT):
+        if mode not in MODES:
+            raise ValueError(f"Unknown fetch mode: {mode}. Expected one of {', '.join(MODES)}.")
+        if mode != "live" and not fixtures_dir:
+            raise ValueError(f"A fixtures directory is required in {mode} mode.")
+        self.cache_dir = cache_dir
+        self.fixtures_dir = fixtures_dir
+        self.mode = mode
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.cache_ttl = cache_ttl
+        self.bucket = TokenBucket(rate=requests_per_second, capacity=max(max_workers, 1))
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": user_agent})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="reddit")
+        self.stats = {"requests": 0, "cache_hits": 0, "revalidated": 0, "fixtures": 0, "retries": 0}
+        self._stats_lock = threading.Lock()
+        for folder in (cache_dir, fixtures_dir):
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    @staticmethod
+    def _entry_name(url):
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()[:32] + ".json"
+
+    @staticmethod
+    def _read_entry(folder, url):
+        if not folder:
+            return None
+        try:
+            with open(os.path.join(folder, RedditFetcher._entry_name(url)), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_entry(folder, url, entry):
+        if folder:
+            write_json_atomic(os.path.join(folder, RedditFetcher._entry_name(url)), entry)
+
+    def _sleep_before_retry(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                delay = self.backoff * (2 ** attempt)
+            # Everyone sharing the bucket backs off, not just this thread
+            self.bucket.pause(delay)
+        else:
+            delay = random.uniform(0, self.backoff * (2 ** attempt))
+        self._count("retries")
+        time.sleep(delay)
+
+    def _update_rate_limit(self, response):
+        remaining = response.headers.get("X-Ratelimit-Remaining")
+        reset = response.headers.get("X-Ratelimit-Reset")
+        if remaining is not None and reset is not None:
+            try:
+                self.bucket.update(float(remaining), float(reset))
+            except ValueError:
+                pass
+
+    def fetch_json(self, url, max_age=None):
+        if self.mode == "offline":
+            fixture = self._read_entry(self.fixtures_dir, url)
+            if fixture is None:
+                raise ConnectionError(f"No recorded fixture for {url} in {self.fixtures_dir}")
+            self._count("fixtures")
+            return fixture["data"]
+
+        cached = self._read_entry(self.cache_dir, url)
+        max_age = self.cache_ttl if max_age is None else max_age
+        if cached and time.time() - cached.get("fetched_at", 0) < max_age:
+            self._count("cache_hits")
+            data = cached["data"]
+        else:
+            data = self._fetch_live(url, cached)
+
+        if self.mode == "record":
+            self._write_entry(self.fixtures_dir, url, {"url": url, "data": data})
+        return data
+
+    def _fetch_live(self, url, cached):
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            self._count("requests")
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                if attempt < self.retries:
+                    self._sleep_before_retry(attempt)
+                    attempt += 1
+                    continue
+                raise ConnectionError(f"Failed to fetch data from Reddit: {str(e)}")
+
+            self._update_rate_limit(response)
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                self._sleep_before_retry(attempt, response)
+                attempt += 1
+                continue
+            break
+
+        if response.status_code == 304 and cached:
+            self._count("revalidated")
+            data = cached["data"]
+        elif response.status_code == 200:
+            data = response.json()
+        else:
+            raise ConnectionError(f"Failed to fetch data from Reddit. Status code: {response.status_code}")
+
+        self._write_entry(self.cache_dir, url, {
+            "url": url,
+            "etag": response.headers.get("ETag", cached.get("etag") if cached else None),
+            "last_modified": response.headers.get("Last-Modified", cached.get("last_modified") if cached else None),
+            "fetched_at": time.time(),
+            "data": data,
+        })
+        return data
+
+    def fetch(self, link):
+        if not link.startswith("http"):
+            raise ValueError("Invalid URL provided.")
+        data = self.fetch_json(json_url(link))
+        post_data = data[0]['data']['children'][0]['data']
+        title = post_data.get('title', '')
+        text = post_data.get('selftext', '')
+        return title, text
+
+    def prefetch(self, links):
+        # Starts every fetch at once and returns {link: Future} so callers only block on the one they need
+        return {link: self.executor.submit(self.fetch, link) for link in dict.fromkeys(links)}
+
+    def fetch_many(self, links):
+        futures = self.prefetch(links)
+        return [futures[link].result() for link in links]
+
+    def print_stats(self):
+        print(f"Reddit fetch: {self.stats['requests']} requests, {self.stats['cache_hits']} cache hits, "
+              f"{self.stats['revalidated']} revalidated, {self.stats['fixtures']} fixtures, {self.stats['retries']} retries")
+
+_default_fetcher = None
+_default_fetcher_lock = threading.Lock()
 
 def fetch_reddit_data(url: str):
+    global _default_fetcher
     if not url.startswith("http"):
         raise ValueError("Invalid URL provided.")
-    headers = { "User-Agent": "User-Agent': 'python:reddit_fetcher:v1.0 (by /u/lllAlexxinolll)" }
-    response = requests.get(f"{url}.json", headers=headers)
-    if response.status_code != 200:
-        raise ConnectionError(f"Failed to fetch data from Reddit. Status code: {response.status_code}")
-    data = response.json()
-    post_data = data[0]['data']['children'][0]['data']
-    title = post_data.get('title', '')
-    text = post_data.get('selftext', '')
-    return title, text
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            _default_fetcher = RedditFetcher(max_workers=1)
+    return _default_fetcher.fetch(url)
 
 if __name__ == "__main__":
     test_url = "https://www.reddit.com/r/confession/comments/1q10oab/my_dad_doesnt_know_hes_not_my_dadand_never_will"
@@ -20,4 +253,4 @@ if __name__ == "__main__":
         print("Title:", title)
         print("Text:", text)
     except Exception as e:
-        print(f"An error occurred: {e}")
\ No newline at end of file
+        print(f"An error occurred: {e}")
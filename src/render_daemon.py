@@ -0,0 +1,399 @@
+import argparse
+import contextlib
+import json
+import os
+import signal
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from dotenv import load_dotenv
+from job_manifest import load_jobs, make_job
+
+load_dotenv()
+
+class QueueFull(Exception):
+    pass
+
+class JobQueue:
+    # SQLite table of story jobs shared by every daemon pointed at the same file.
+    # Claims take the database write lock (BEGIN IMMEDIATE), so two daemons never pick up the same job.
+    # Running jobs whose worker stopped sending heartbeats go back to the queue and resume from the run ledger.
+
+    def __init__(self, path, max_queued=100, stale_after=300, max_attempts=3):
+        self.path = path
+        self.max_queued = max_queued
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # WAL lets status readers and the API keep going while a worker writes
+        db = sqlite3.connect(path, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+        finally:
+            db.close()
+        with self._transaction() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    job TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress REAL NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    captions TEXT,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    started REAL,
+                    finished REAL,
+                    heartbeat REAL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+
+    @contextlib.contextmanager
+    def _transaction(self, mode="IMMEDIATE"):
+        # One short-lived connection per call, so the queue can be used from any thread.
+        # Writers take the lock up front instead of upgrading a read lock halfway through.
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            db.execute(f"BEGIN {mode}")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    @staticmethod
+    def _status(row):
+        job = json.loads(row["job"])
+        return {
+            "id": row["id"],
+            "title": job.get("title"),
+            "link": job.get("link"),
+            "status": row["status"],
+            "stage": row["stage"],
+            "progress": row["progress"],
+            "worker": row["worker"],
+            "attempts": row["attempts"],
+            "captions": json.loads(row["captions"]) if row["captions"] else [],
+            "error": row["error"],
+            "created": row["created"],
+            "started": row["started"],
+            "finished": row["finished"],
+        }
+
+    def enqueue(self, jobs):
+        # All or nothing: when the jobs don't fit, nothing is queued and QueueFull tells the producer to back off.
+        # Jobs already queued or running are left alone, finished ones are queued again.
+        jobs = list({job["id"]: job for job in jobs}.values())
+        now = time.time()
+        with self._transaction() as db:
+            placeholders = ", ".join("?" for _ in jobs)
+            active = {row["id"] for row in db.execute(f"SELECT id FROM jobs WHERE status IN ('queued', 'running') AND id IN ({placeholders})", [job["id"] for job in jobs])}
+            new = [job for job in jobs if job["id"] not in active]
+            queued = db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if queued + len(new) > self.max_queued:
+                raise QueueFull(f"Queue is full ({queued}/{self.max_queued} jobs waiting), retry later.")
+            db.executemany("""
+                INSERT INTO jobs (id, job, status, created) VALUES (?, ?, 'queued', ?)
+                ON CONFLICT (id) DO UPDATE SET job = excluded.job, status = 'queued', stage = NULL, progress = 0,
+                    worker = NULL, attempts = 0, captions = NULL, error = NULL, created = excluded.created,
+                    started = NULL, finished = NULL, heartbeat = NULL
+            """, [(job["id"], json.dumps(job, ensure_ascii=False), now) for job in new])
+        return [self.get(job["id"]) for job in jobs]
+
+    def claim(self, worker, limit=1):
+        now = time.time()
+        with self._transaction() as db:
+            # Jobs of a worker that died are retried, unless they already took it down too often
+            stale = now - self.stale_after
+            db.execute("UPDATE jobs SET status = 'failed', error = 'worker stopped responding', finished = ? WHERE status = 'running' AND heartbeat < ? AND attempts >= ?", (now, stale, self.max_attempts))
+            db.execute("UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND heartbeat < ?", (stale,))
+            rows = db.execute("SELECT id, job FROM jobs WHERE status = 'queued' ORDER BY created LIMIT ?", (limit,)).fetchall()
+            db.executemany(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, stage = NULL, progress = 0, started = ?, heartbeat = ? WHERE id = ?",
+                [(worker, now, now, row["id"]) for row in rows],
+            )
+        return [json.loads(row["job"]) for row in rows]
+
+    def heartbeat(self, worker, job_ids):
+        if not job_ids:
+            return
+        placeholders = ", ".join("?" for _ in job_ids)
+        with self._transaction() as db:
+            db.execute(f"UPDATE jobs SET heartbeat = ? WHERE worker = ? AND status = 'running' AND id IN ({placeholders})", [time.time(), worker, *job_ids])
+
+    def progress(self, worker, job_id, stage, progress):
+        with self._transaction() as db:
+            db.execute("UPDATE jobs SET stage = ?, progress = ?, heartbeat = ? WHERE id = ? AND worker = ? AND status = 'running'", (stage, progress, time.time(), job_id, worker))
+
+    def finish(self, worker, job_id, status, captions=None, stage=None, error=None):
+        # A job requeued from under a slow worker belongs to its new worker, so only the owner may finish it
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, stage = COALESCE(?, stage), progress = CASE WHEN ? = 'done' THEN 1 ELSE progress END, captions = ?, error = ?, finished = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (status, stage, status, json.dumps(captions or [], ensure_ascii=False), error, time.time(), job_id, worker),
+            )
+
+    def cancel(self, job_id):
+        # Only jobs still waiting can be cancelled, a running story finishes its batch
+        with self._transaction() as db:
+            return db.execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'", (time.time(), job_id)).rowcount > 0
+
+    def get(self, job_id):
+        with self._transaction("DEFERRED") as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._status(row) if row else None
+
+    def list(self, status=None, limit=100):
+        with self._transaction("DEFERRED") as db:
+            if status:
+                rows = db.execute("SELECT * FROM jobs WHERE status = ? ORDER BY created DESC LIMIT ?", (status, limit)).fetchall()
+            else:
+                rows = db.execute("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+        return [self._status(row) for row in rows]
+
+    def counts(self):
+        with self._transaction("DEFERRED") as db:
+            return {row["status"]: row["count"] for row in db.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status")}
+
+class RenderDaemon:
+    # Keeps one StoryRunner (Kokoro, WhisperX, browser pages, VectCut connections) alive and feeds it
+    # batches claimed from the queue. Stories of a batch overlap in the stage pipeline like a normal run.
+
+    def __init__(self, queue, runner, batch_size=4, poll_interval=2.0, heartbeat_interval=30.0):
+        self.queue = queue
+        self.runner = runner
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._running = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def _send_heartbeats(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            with self._lock:
+                job_ids = list(self._running)
+            try:
+                self.queue.heartbeat(self.worker_id, job_ids)
+            except sqlite3.Error as e:
+                print(f"Failed to send heartbeat: {str(e)}")
+
+    def _progress(self, job, stage, completed, total):
+        self.queue.progress(self.worker_id, job["id"], stage, round(completed / total, 3))
+
+    def serve_forever(self):
+        threading.Thread(target=self._send_heartbeats, name="heartbeat", daemon=True).start()
+        print(f"Render daemon {self.worker_id} waiting for jobs in {self.queue.path}")
+        while not self._stop.is_set():
+            jobs = self.queue.claim(self.worker_id, self.batch_size)
+            if not jobs:
+                self._stop.wait(self.poll_interval)
+                continue
+            self.process(jobs)
+
+    def process(self, jobs):
+        print(f"Claimed {len(jobs)} jobs: {', '.join(job['id'] for job in jobs)}")
+        self.runner.start_run(f"daemon-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        with self._lock:
+            self._running.update(job["id"] for job in jobs)
+        # Reopened per batch so checkpoints written by other daemons are visible
+        ledger = self.runner.open_ledger("daemon")
+        for job in jobs:
+            if job.pop("fresh", False):
+                ledger.reset(job["id"])
+        try:
+            outcomes = self.runner.run(jobs, ledger, on_progress=self._progress)
+        except Exception as e:
+            print(f"Batch failed: {str(e)}")
+            outcomes = [{"job": job, "status": "failed", "captions": [], "stage": None, "error": str(e)} for job in jobs]
+
+        for outcome in outcomes:
+            status = "failed" if outcome["status"] == "failed" else "done"
+            self.queue.finish(self.worker_id, outcome["job"]["id"], status, captions=outcome["captions"], stage=outcome["stage"], error=outcome["error"])
+            with self._lock:
+                self._running.discard(outcome["job"]["id"])
+        self.runner.print_stats(reset=True)
+        print(f"Batch finished, queue: {self.queue.counts()}")
+
+def parse_address(value):
+    host, _, port = value.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+def make_api_server(queue, address):
+    # POST /jobs (a job, a list of jobs or {"jobs": [...]}), GET /jobs[?status=], GET /jobs/<id>,
+    # DELETE /jobs/<id> and GET /health. A full queue answers 429 with Retry-After.
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body, headers=None):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _route(self):
+            url = urlparse(self.path)
+            return [part for part in url.path.split("/") if part], parse_qs(url.query)
+
+        def do_GET(self):
+            parts, query = self._route()
+            if parts == ["health"]:
+                self._send(200, {"queue": queue.counts(), "max_queued": queue.max_queued})
+            elif parts == ["jobs"]:
+                status = query.get("status", [None])[0]
+                self._send(200, {"jobs": queue.list(status, int(query.get("limit", ["100"])[0]))})
+            elif len(parts) == 2 and parts[0] == "jobs":
+                job = queue.get(parts[1])
+                self._send(200, job) if job else self._send(404, {"error": f"Unknown job {parts[1]}"})
+            else:
+                self._send(404, {"error": "Not found"})
+
+        def do_POST(self):
+            parts, _ = self._route()
+            if parts != ["jobs"]:
+                self._send(404, {"error": "Not found"})
+                return
+            try:
+                data = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+                raw_jobs = data.get("jobs", [data]) if isinstance(data, dict) else data
+                if not isinstance(raw_jobs, list) or not raw_jobs:
+                    raise ValueError("Expected a job, a list of jobs or {\"jobs\": [...]}.")
+                self._send(202, {"jobs": queue.enqueue([make_job(raw) for raw in raw_jobs])})
+            except QueueFull as e:
+                self._send(429, {"error": str(e)}, headers={"Retry-After": "30"})
+            except (ValueError, TypeError, OSError) as e:
+                self._send(400, {"error": str(e)})
+
+        def do_DELETE(self):
+            parts, _ = self._route()
+            if len(parts) != 2 or parts[0] != "jobs":
+                self._send(404, {"error": "Not found"})
+            elif queue.cancel(parts[1]):
+                self._send(200, queue.get(parts[1]))
+            else:
+                self._send(409, {"error": f"Job {parts[1]} is not queued"})
+
+        def log_message(self, format, *args):
+            # Status polling would drown out the pipeline output
+            pass
+
+    return ThreadingHTTPServer(address, Handler)
+
+def serve(queue, args):
+    api = None
+    if args.http:
+        api = make_api_server(queue, parse_address(args.http))
+        threading.Thread(target=api.serve_forever, name="api", daemon=True).start()
+        print(f"Job API listening on http://{api.server_address[0]}:{api.server_address[1]}")
+
+    if args.no_worker:
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        if api:
+            api.shutdown()
+        return
+
+    from story_runner import StoryRunner
+    runner = StoryRunner(run_id=f"daemon-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+    try:
+        # Models are loaded once up front instead of on the first job
+        runner.warm_up()
+        daemon = RenderDaemon(queue, runner, batch_size=args.batch)
+
+        def request_stop(signum, frame):
+            print("Stopping after the current batch...")
+            daemon.stop()
+
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
+        daemon.serve_forever()
+    finally:
+        if api:
+            api.shutdown()
+        runner.close()
+
+def submit(queue, args):
+    jobs = load_jobs(args.manifest)
+    if args.fresh:
+        jobs = [dict(job, fresh=True) for job in jobs]
+    while True:
+        try:
+            statuses = queue.enqueue(jobs)
+            break
+        except QueueFull as e:
+            if not args.wait:
+                print(str(e))
+                sys.exit(1)
+            time.sleep(30)
+    for status in statuses:
+        print(f"{status['id']}: {status['status']}")
+
+def status(queue, args):
+    if args.id:
+        job = queue.get(args.id)
+        if not job:
+            print(f"Unknown job {args.id}")
+            sys.exit(1)
+        print(json.dumps(job, indent=2, ensure_ascii=False))
+        return
+    for job in queue.list(args.status):
+        stage = f" {job['stage']} {job['progress']:.0%}" if job["status"] == "running" else ""
+        print(f"{job['id']}  {job['status']}{stage}  {job['title'] or job['link']}")
+    print(f"Queue: {queue.counts()}")
+
+def cancel(queue, args):
+    if not queue.cancel(args.id):
+        print(f"Job {args.id} is not queued")
+        sys.exit(1)
+    print(f"{args.id}: cancelled")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident render worker fed from a shared SQLite job queue.")
+    parser.add_argument("--queue", default=os.getenv("RENDER_QUEUE", os.path.join(os.getenv("RESULTS_DIR", "results"), "queue.db")), help="SQLite queue file, shared by every daemon")
+    parser.add_argument("--max-queued", type=int, default=int(os.getenv("RENDER_QUEUE_MAX", "100")), help="jobs allowed to wait before submissions are refused")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="load the models once and render queued jobs until stopped")
+    serve_parser.add_argument("--batch", type=int, default=int(os.getenv("RENDER_BATCH", "4")), help="jobs claimed and pipelined together")
+    serve_parser.add_argument("--http", default=os.getenv("RENDER_API"), help="also serve the job API on host:port")
+    serve_parser.add_argument("--no-worker", action="store_true", help="only serve the job API")
+    serve_parser.set_defaults(func=serve)
+
+    submit_parser = commands.add_parser("submit", help="queue the jobs of a JSONL/YAML manifest")
+    submit_parser.add_argument("manifest")
+    submit_parser.add_argument("--fresh", action="store_true", help="ignore the run ledger and redo every stage")
+    submit_parser.add_argument("--wait", action="store_true", help="retry until the queue has room instead of failing")
+    submit_parser.set_defaults(func=submit)
+
+    status_parser = commands.add_parser("status", help="show one job or the most recent ones")
+    status_parser.add_argument("id", nargs="?")
+    status_parser.add_argument("--status", choices=["queued", "running", "done", "failed", "cancelled"])
+    status_parser.set_defaults(func=status)
+
+    cancel_parser = commands.add_parser("cancel", help="remove a job that hasn't started yet")
+    cancel_parser.add_argument("id")
+    cancel_parser.set_defaults(func=cancel)
+
+    args = parser.parse_args()
+    args.func(JobQueue(args.queue, max_queued=args.max_queued), args)
@@ -73,12 +73,97 @@ CURSE_WORDS = {
     "have sex": "make love",
 }
 
-PATTERN = re.compile(
-    r'\b(' + '|'.join(re.escape(abbr) for abbr in ABBREVIATIONS) + r')\b',
-    re.IGNORECASE
-)
-
-CURSE_WORDS_PATTERN = re.compile(
-    r'\b(' + '|'.join(re.escape(word) for word in CURSE_WORDS) + r')\b',
-    re.IGNORECASE
-)
\ No newline at end of file
+# Display abbreviations used for subtitles (spoken form -> written form)
+DISPLAY_ABBREVIATIONS = {
+    "mister": "Mr.",
+    "misses": "Mrs.",
+    "doctor": "Dr.",
+    "saint": "St.",
+    "versus": "vs.",
+    "et cetera": "etc.",
+    "for example": "e.g.",
+    "that is": "i.e.",
+    "am i the asshole": "AITA",
+}
+
+WHITESPACE_PATTERN = re.compile(r"\s*\r?\n\s*")
+
+def normalize_whitespace(text):
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+def _trie_pattern(keys):
+    # One alternation shaped like a trie: at each character the regex engine follows a single branch
+    # instead of retrying every rule, and longer keys win because the optional end-of-key is tried last
+    trie = {}
+    for key in keys:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char != ""]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return re.compile(r"\b(" + build(trie) + r")\b", re.IGNORECASE)
+
+def expand_case(phrase, replacement):
+    if phrase.isupper():
+        return replacement.upper()
+    elif phrase.istitle():
+        return replacement.title()
+    return replacement
+
+def abbreviate_case(phrase, replacement):
+    if phrase.isupper():
+        return replacement.upper()
+    elif phrase[0].isupper():
+        return replacement
+    return replacement.lower()
+
+CASE_STRATEGIES = {"expand": expand_case, "abbreviate": abbreviate_case}
+
+class Normalizer:
+    # Applies a set of whole-word replacement rules in a single regex pass, preserving the case of the
+    # matched text. Rule sets can be chained with compose(), which folds later sets into the replacement
+    # strings of earlier ones at build time so the text is still scanned only once.
+
+    def __init__(self, rules, case="expand"):
+        self.rules = {key.lower(): value for key, value in rules.items()}
+        self.case = case
+        self._case = CASE_STRATEGIES[case]
+        self.pattern = _trie_pattern(self.rules) if self.rules else None
+
+    def _replace(self, match):
+        phrase = match.group(0)
+        return self._case(phrase, self.rules[phrase.lower()])
+
+    def apply(self, text):
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(self._replace, text)
+
+    __call__ = apply
+
+    @classmethod
+    def compose(cls, *rule_sets, case="expand"):
+        rules = {}
+        for rule_set in reversed(rule_sets):
+            later = Normalizer(rules, case=case)
+            merged = {key.lower(): later.apply(value) for key, value in rule_set.items()}
+            merged.update({key: value for key, value in rules.items() if key not in merged})
+            rules = merged
+        return cls(rules, case=case)
+
+    def reverse(self, case="abbreviate"):
+        # Maps replacements back to their keys, e.g. for showing the written form of spoken text
+        return Normalizer({value.lower(): key for key, value in self.rules.items()}, case=case)
+
+# Text sent to TTS: expand abbreviations, then soften curse words (including ones inside expansions)
+TTS_NORMALIZER = Normalizer.compose(ABBREVIATIONS, CURSE_WORDS, case="expand")
+
+# Text shown in subtitles
+DISPLAY_NORMALIZER = Normalizer(DISPLAY_ABBREVIATIONS, case="abbreviate")
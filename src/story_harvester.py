@@ -0,0 +1,104 @@
+import heapq
+import re
+from urllib.parse import urlencode
+from replacements import normalize_whitespace
+from workspace import story_id_for
+
+REDDIT_URL = "https://www.reddit.com"
+WORDS_PER_MINUTE = 170  # Kokoro at speed 1.0, measured on finished narrations
+REMOVED_TEXTS = {"[removed]", "[deleted]"}
+
+def estimate_duration(text, speed=1.0, words_per_minute=WORDS_PER_MINUTE):
+    # Narration length in seconds from the word count, good enough to reject stories before any TTS
+    return len(re.findall(r"\S+", text)) / (words_per_minute * speed) * 60
+
+class StoryHarvester:
+    # Streams self posts from subreddit listings and keeps the ones worth narrating.
+    # Everything is decided from the listing JSON alone, so rejected stories never cost TTS or alignment time.
+
+    def __init__(self, fetcher, produced_ids=(), min_score=100, min_duration=45, max_duration=600, allow_nsfw=False, speed=1.0, listing_max_age=3600):
+        self.fetcher = fetcher
+        self.produced_ids = set(produced_ids)
+        self.min_score = min_score
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.allow_nsfw = allow_nsfw
+        self.speed = speed
+        self.listing_max_age = listing_max_age
+
+    def listing(self, subreddit, time_filter="day", sort="top", limit=100, max_pages=10):
+        # Pages through /r/<sub>/<sort>.json with the `after` cursor, yielding raw post data lazily
+        after = None
+        for _ in range(max_pages):
+            params = {"t": time_filter, "limit": limit, "raw_json": 1}
+            if after:
+                params["after"] = after
+            data = self.fetcher.fetch_json(f"{REDDIT_URL}/r/{subreddit}/{sort}.json?{urlencode(params)}", max_age=self.listing_max_age)
+            listing = data.get("data", {})
+            for child in listing.get("children", []):
+                if child.get("kind") == "t3":
+                    yield child["data"]
+            after = listing.get("after")
+            if not after:
+                break
+
+    def _reject_reason(self, post):
+        if not post.get("is_self") or post.get("stickied"):
+            return "not a story"
+        if post.get("over_18") and not self.allow_nsfw:
+            return "nsfw"
+        if post.get("score", 0) < self.min_score:
+            return "score"
+        if post.get("selftext", "").strip() in REMOVED_TEXTS:
+            return "removed"
+        return None
+
+    def candidates(self, subreddit, time_filter="day", **listing_options):
+        for post in self.listing(subreddit, time_filter, **listing_options):
+            if self._reject_reason(post):
+                continue
+            link = f"{REDDIT_URL}{post['permalink']}"
+            story_id = story_id_for(post["title"], link=link)
+            if story_id in self.produced_ids:
+                continue
+            text = normalize_whitespace(post.get("selftext", ""))
+            duration = estimate_duration(f"{post['title']} {text}", self.speed)
+            if not self.min_duration <= duration <= self.max_duration:
+                continue
+            yield {
+                "id": story_id,
+                "link": link,
+                "title": post["title"],
+                "text": text,
+                "subreddit": post.get("subreddit", subreddit),
+                "score": post.get("score", 0),
+                "estimated_duration": duration,
+                # The job narrates at the speed the duration was estimated for
+                "speed": self.speed,
+            }
+
+    def harvest(self, subreddits, quota, time_filter="day", **listing_options):
+        # Each subreddit contributes at most `quota` candidates (its listing is already sorted),
+        # then the best-scoring ones across all subreddits fill the quota
+        picked = []
+        seen = set()
+        for subreddit in subreddits:
+            taken = 0
+            for candidate in self.candidates(subreddit, time_filter, **listing_options):
+                if candidate["id"] in seen:
+                    continue
+                seen.add(candidate["id"])
+                picked.append(candidate)
+                taken += 1
+                if taken >= quota:
+                    break
+        return heapq.nlargest(quota, picked, key=lambda candidate: candidate["score"])
+
+if __name__ == "__main__":
+    import sys
+    from reddit_story_fetcher import RedditFetcher
+
+    subreddits = sys.argv[1:] or ["confession", "TrueOffMyChest"]
+    with RedditFetcher() as fetcher:
+        for story in StoryHarvester(fetcher).harvest(subreddits, quota=10):
+            print(f"{story['score']:>6} {story['estimated_duration']:>5.0f}s r/{story['subreddit']} {story['title']}")
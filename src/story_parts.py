@@ -0,0 +1,65 @@
+import math
+import numpy as np
+from subtitle_builder import interpolate_missing, load_words
+
+SENTENCE_ENDINGS = (".", "!", "?", "…", '."', '!"', '?"')
+
+def _cut_candidates(texts, starts, ends, sentences_only):
+    # Cut points sit in the pause after a word, halfway to the next word's start
+    indices = [i for i in range(len(texts) - 1) if not sentences_only or texts[i].endswith(SENTENCE_ENDINGS)]
+    indices = np.array(indices, dtype=np.int64)
+    if len(indices) == 0:
+        return indices.astype(np.float64)
+    return (ends[indices] + starts[indices + 1]) / 2
+
+def plan_parts(timeline, duration, target_duration, max_duration=None):
+    # Splits one narration into parts of roughly target_duration seconds, cutting at sentence ends.
+    # Returns [{"index", "count", "start", "end"}] in seconds of the narration, covering it without gaps.
+    max_duration = max_duration or target_duration * 1.5
+    if not target_duration or duration <= max_duration:
+        return [{"index": 1, "count": 1, "start": 0.0, "end": duration}]
+
+    texts, starts, ends = load_words(timeline)
+    starts, ends = interpolate_missing(starts, ends, duration)
+    sentence_cuts = _cut_candidates(texts, starts, ends, sentences_only=True)
+    word_cuts = _cut_candidates(texts, starts, ends, sentences_only=False)
+
+    count = math.ceil(duration / target_duration)
+    cuts = []
+    previous = 0.0
+    for k in range(1, count):
+        # Aim for equal parts of what is left so an early long part doesn't starve the last one
+        ideal = previous + (duration - previous) / (count - k + 1)
+        options = sentence_cuts[(sentence_cuts > previous) & (sentence_cuts - previous <= max_duration)]
+        if len(options) == 0:
+            options = word_cuts[(word_cuts > previous) & (word_cuts - previous <= max_duration)]
+        if len(options) == 0:
+            continue
+        cut = float(options[np.argmin(np.abs(options - ideal))])
+        if duration - cut < 1.0:
+            break
+        cuts.append(cut)
+        previous = cut
+
+    bounds = [0.0] + cuts + [duration]
+    return [{"index": i, "count": len(bounds) - 1, "start": start, "end": end} for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:]), 1)]
+
+def part_cues(cues, part):
+    # The cues of a part, re-based so the part starts at 0. A cue that spans a cut is split there:
+    # each part shows only its own words, and the later part's subtitles begin with the part itself.
+    selected = []
+    for cue in cues:
+        if cue["end"] <= part["start"] + 1e-6 or cue["start"] >= part["end"]:
+            continue
+        words = [word for word in cue["words"] if part["start"] - 1e-6 <= word["start"] < part["end"]]
+        if not words:
+            continue
+        text = cue["text"] if len(words) == len(cue["words"]) else " ".join(word["word"] for word in words)
+        start = max(cue["start"], part["start"]) - part["start"]
+        end = min(cue["end"], part["end"]) - part["start"]
+        words = [dict(word, start=word["start"] - part["start"], end=word["end"] - part["start"]) for word in words]
+        selected.append(dict(cue, index=len(selected) + 1, start=start, end=end, text=text, words=words))
+    if selected:
+        selected[0]["start"] = 0.0
+        selected[-1]["end"] = part["end"] - part["start"]
+    return selected
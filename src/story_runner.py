@@ -0,0 +1,398 @@
+import os
+
+from tts import TTS, voice_name_for, warm_up, shutdown_process_pools
+from tiktok_video_generator import TikTokVideoGenerator
+from ffmpeg_video_generator import FFmpegVideoGenerator
+from vectcut_client import VectCutClient
+from media_info import BackgroundVideoPool, MediaInfoCache, list_videos
+from subtitles import Subtitles
+from reddit_story_fetcher import RedditFetcher
+from story_parts import part_cues, plan_parts
+from subtitle_builder import SubtitleBuilder
+from caption import generate_caption
+from instrumentation import TRACER, output_bytes, profiled, story_scope
+from job_manifest import RunLedger
+from pipeline import Stage, StagePipeline
+from artifact_cache import ArtifactCache
+from workspace import Workspace, story_id_for, variant_id_for, write_json_atomic
+
+HASHTAGS = "#fyp #foryou #reddit #redditstories #fullystory #storytime #redditreadings #reddit_tiktok"
+
+# Stages whose outputs are JSON and point at files in the story workspace, so a rerun can restore them
+CHECKPOINT_STAGES = ("fetch", "process_title_audio", "process_voice_audio", "render_frame", "build_subtitles", "split_parts", "assemble_video")
+
+def get_pool_sizes():
+    pool_sizes = {"network": 4, "tts": 1, "audio": 2, "browser": 1, "align": 1, "vectcut": 2}
+    for pool in pool_sizes:
+        value = os.getenv(f"PIPELINE_WORKERS_{pool.upper()}")
+        if value:
+            pool_sizes[pool] = int(value)
+    return pool_sizes
+
+def required_vars(render_backend):
+    return ["AVATAR_PATH", "VECTCUT_DIR", "BG_VIDEO"] if render_backend == "capcut" else ["AVATAR_PATH", "BG_VIDEO"]
+
+class StoryRunner:
+    # Builds every component once from the environment and turns jobs into videos through the stage pipeline.
+    # main() uses one per invocation; the render daemon keeps one alive so the Kokoro/WhisperX models,
+    # browser pages and HTTP connections are reused from job to job.
+
+    hook_duration = 0.3  # seconds
+    mid_silence_duration = 0.4  # seconds
+
+    def __init__(self, run_id=None):
+        self.render_backend = os.getenv("RENDER_BACKEND", "capcut").lower()
+        self.required_vars = required_vars(self.render_backend)
+        for var_name in self.required_vars:
+            if not os.getenv(var_name):
+                raise EnvironmentError(f"{var_name} environment variable is not set.")
+
+        self.subtitle_format = os.getenv("SUBTITLE_FORMAT", "srt").lower()
+        self.results_dir = os.getenv("RESULTS_DIR", "results")
+        self.vectcut_dir = os.getenv("VECTCUT_DIR")
+        self.vectcut_port = os.getenv("VECTCUT_PORT", "9001")
+        self.stream_tts_min_chars = int(os.getenv("STREAM_TTS_MIN_CHARS", "8000"))
+        self.tts_workers = int(os.getenv("TTS_WORKERS", "1"))
+        self.part_target_seconds = float(os.getenv("PART_TARGET_SECONDS", "0"))
+        self.ffmpeg_preset = os.getenv("FFMPEG_PRESET", "veryfast")
+        self.profile_story = os.getenv("PROFILE_STORY")
+        self.profile_mode = os.getenv("PROFILE_MODE", "cprofile").lower()
+
+        use_cache = os.getenv("USE_CACHE", "true").lower() == "true"
+        cache_dir = os.getenv("CACHE_DIR", os.path.join(self.results_dir, "cache"))
+        cache_max_gb = float(os.getenv("CACHE_MAX_GB", "5"))
+
+        self.pool_sizes = get_pool_sizes()
+        self.vectcut_client = VectCutClient(
+            api_url=f"http://localhost:{self.vectcut_port}",
+            timeout=(5, float(os.getenv("VECTCUT_TIMEOUT", "120"))),
+            retries=int(os.getenv("VECTCUT_RETRIES", "3")),
+            pool_size=self.pool_sizes["vectcut"],
+            batch_endpoint=os.getenv("VECTCUT_BATCH_ENDPOINT"),
+        )
+        self.media_info = MediaInfoCache(os.getenv("MEDIA_INFO_CACHE", os.path.join(self.results_dir, "media_info.json")))
+        self.background_pool = BackgroundVideoPool(list_videos(os.getenv("BG_VIDEO")), self.media_info)
+        self.cache = ArtifactCache(cache_dir, max_bytes=int(cache_max_gb * 1024 ** 3)) if use_cache else None
+        self.reddit_fetcher = RedditFetcher(
+            cache_dir=os.path.join(cache_dir, "reddit") if use_cache else None,
+            fixtures_dir=os.getenv("REDDIT_FIXTURES"),
+            mode=os.getenv("REDDIT_FETCH_MODE", "live").lower(),
+            max_workers=self.pool_sizes["network"],
+        )
+
+        self.subtitles_generator = Subtitles(result_folder=self.results_dir, device="cpu", compute_type="int8", cache=self.cache)
+        avatar_path = os.getenv("AVATAR_PATH")
+        if os.getenv("FRAME_RENDERER", "postfully").lower() == "local":
+            from local_reddit_frame_image import LocalRedditFrameImage
+            self.frame_renderer = LocalRedditFrameImage(avatar_path=avatar_path, result_folder=self.results_dir, cache=self.cache)
+        else:
+            from reddit_frame_image import RedditFrameImage
+            self.frame_renderer = RedditFrameImage(
+                postfully_url=os.getenv("POSTFULLY_URL", "https://postfully.app/tools/reddit-post-template/"),
+                avatar_path=avatar_path,
+                result_folder=self.results_dir,
+                cache=self.cache,
+                pool_size=self.pool_sizes["browser"],
+                headless=os.getenv("FRAME_HEADLESS", "true").lower() == "true",
+            )
+
+        os.makedirs(self.results_dir, exist_ok=True)
+        self.trace = os.getenv("TRACE", "true").lower() == "true"
+        self.workspace = Workspace(self.results_dir, run_id=run_id)
+        self.start_run(self.workspace.run_id)
+
+        self.pipeline = StagePipeline([
+            Stage("fetch", self._instrumented("fetch", self.fetch_story), pool="network"),
+            Stage("synthesize_title", self._instrumented("synthesize_title", self.synthesize_title), deps=["fetch"], pool="tts"),
+            Stage("synthesize_voice", self._instrumented("synthesize_voice", self.synthesize_voice), deps=["fetch"], pool="tts"),
+            Stage("process_title_audio", self._instrumented("process_title_audio", self.process_title_audio), deps=["synthesize_title"], pool="audio"),
+            Stage("process_voice_audio", self._instrumented("process_voice_audio", self.process_voice_audio), deps=["synthesize_voice"], pool="audio"),
+            Stage("render_frame", self._instrumented("render_frame", self.render_frame), deps=["fetch"], pool="browser"),
+            Stage("build_subtitles", self._instrumented("build_subtitles", self.build_subtitles), deps=["process_voice_audio"], pool="align"),
+            Stage("split_parts", self._instrumented("split_parts", self.split_parts), deps=["build_subtitles"], pool="audio"),
+            Stage("assemble_video", self._instrumented("assemble_video", self.assemble_video), deps=["process_title_audio", "process_voice_audio", "render_frame", "split_parts"], pool="vectcut"),
+        ], pool_sizes=self.pool_sizes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.frame_renderer.close()
+        self.reddit_fetcher.close()
+        self.vectcut_client.close()
+        shutdown_process_pools()
+        TRACER.close()
+
+    def start_run(self, run_id=None):
+        # A new run record and trace file; the render daemon starts one per batch
+        self.workspace.start_run(run_id)
+        if self.trace:
+            TRACER.configure(os.path.join(self.results_dir, "traces", f"{self.workspace.run_id}.jsonl"))
+
+    def open_ledger(self, name):
+        return RunLedger(os.path.join(self.results_dir, "ledgers", f"{name}.jsonl"), root=self.results_dir)
+
+    def warm_up(self, jobs=None):
+        # Loads Kokoro with the voices the jobs need (all default voices when no jobs are given)
+        voices = {voice_name_for(job["gender"], job["voice"]) for job in jobs} if jobs is not None else {voice_name_for("f"), voice_name_for("m")}
+        if voices:
+            print("Loading TTS model and voices...")
+            warm_up(sorted(voices))
+
+    def run(self, jobs, ledger, fresh=False, on_progress=None):
+        # Returns one outcome per job, in order: {"job", "status": done/failed/skipped, "captions", "stage", "error"}.
+        # on_progress(job, stage, completed_stages, total_stages) is called as stages finish.
+        outcomes = [{"job": job, "status": None, "captions": [], "stage": None, "error": None} for job in jobs]
+        stories = []
+        completed = []
+        for outcome, job in zip(outcomes, jobs):
+            if fresh:
+                ledger.reset(job["id"])
+            done = ledger.completed(job["id"])
+            if "assemble_video" in done:
+                print(f"Skipping {job.get('title') or job['link']}: already produced in an earlier run")
+                outcome.update(status="skipped", captions=done["assemble_video"])
+                continue
+            story = dict(job, index=len(stories))
+            story.update(done)
+            if "fetch" in story:
+                story["fetch"] = dict(story["fetch"], workspace=self.story_workspace(story, story["fetch"]["story_id"]))
+                print(f"Resuming {story['fetch']['title']} after: {', '.join(done)}")
+            elif "text" not in story:
+                # All links start downloading now, the fetch stage only waits for its own
+                story["prefetched"] = self.reddit_fetcher.prefetch([story["link"]])[story["link"]]
+            stories.append(story)
+            completed.append(list(done))
+        pending = [outcome for outcome in outcomes if outcome["status"] is None]
+        if not stories:
+            return outcomes
+
+        # Kokoro is only loaded when some story still has audio to synthesize
+        try:
+            self.warm_up([story for story in stories if "process_title_audio" not in story or "process_voice_audio" not in story])
+        except Exception as e:
+            print(f"Failed to load TTS model: {str(e)}")
+            for outcome in pending:
+                outcome.update(status="failed", stage="warm_up", error=str(e))
+            return outcomes
+
+        total_stages = len(self.pipeline.stages)
+
+        def on_complete(result, stage, value):
+            if stage in CHECKPOINT_STAGES:
+                if stage == "fetch":
+                    value = {"title": value["title"], "text": value["text"], "story_id": value["workspace"].story_id}
+                ledger.checkpoint(result.context["id"], stage, value)
+            if on_progress is not None:
+                on_progress(result.context, stage, len(result.completed), total_stages)
+
+        results = self.pipeline.run(stories, completed=completed, on_complete=on_complete)
+
+        for result, outcome in zip(results, pending):
+            story_workspace = result.context.get("fetch", {}).get("workspace")
+            if story_workspace:
+                self.workspace.record_run(story_workspace.name, "done" if result.success else "failed", stage=result.failed_stage, error=str(result.error) if result.error else None)
+            if result.success:
+                self.workspace.mark_produced(story_workspace.story_id, title=result.context["fetch"]["title"], link=result.context.get("link"))
+                outcome.update(status="done", captions=result.context["assemble_video"])
+            else:
+                outcome.update(status="failed", stage=result.failed_stage, error=str(result.error))
+        return outcomes
+
+    def print_stats(self, reset=False):
+        # With reset, latencies and spans start over so a long-lived process doesn't accumulate them
+        if self.cache is not None:
+            self.cache.print_stats()
+        self.reddit_fetcher.print_stats()
+        self.vectcut_client.print_metrics()
+        TRACER.print_summary()
+        if reset:
+            self.vectcut_client.reset_metrics()
+            TRACER.reset()
+
+    def _instrumented(self, name, func):
+        # Every stage gets a span attributed to its story; PROFILE_STORY (a job id or 1-based position)
+        # additionally profiles each stage of that one story
+        def run(story):
+            with story_scope(story["id"]), TRACER.span(name, kind="stage") as record:
+                if self.profile_story in (story["id"], str(story["index"] + 1)):
+                    extension = "svg" if self.profile_mode == "py-spy" else "prof"
+                    with profiled(os.path.join(self.results_dir, "profiles", f"{story['id']}.{name}.{extension}"), self.profile_mode):
+                        value = func(story)
+                else:
+                    value = func(story)
+                if TRACER.enabled:
+                    record["bytes_written"] = output_bytes(value)
+                return value
+        return run
+
+    def make_tts(self, story):
+        return TTS(result_folder=story["fetch"]["workspace"].dir, gender=story["gender"], voice=story["voice"], cache=self.cache)
+
+    def story_workspace(self, story, story_id):
+        # Scoped by narration as well as by post, so A/B variants and concurrent daemon jobs
+        # for the same post never overwrite each other's audio, subtitles or manifest
+        variant = variant_id_for(voice_name_for(story["gender"], story["voice"]), story["speed"], story["style"])
+        return self.workspace.story(story_id, variant)
+
+    def fetch_story(self, story):
+        if "text" in story:
+            story_title, story_text = story["title"], story["text"]
+        else:
+            story_title, story_text = story.pop("prefetched").result()
+        story_workspace = self.story_workspace(story, story_id_for(story_title, story_text, link=story.get("link")))
+        story_json = story_workspace.path("story.json")
+        write_json_atomic(story_json, {"title": story_title, "text": story_text, "link": story.get("link"), "gender": story["gender"], "voice": story["voice"], "speed": story["speed"], "style": story["style"]})
+        story_workspace.record("story", story_json)
+        print(f"Starting generation for TikTok video ({story['index']+1}) {story_title}:\n")
+        return {"title": story_title, "text": story_text, "workspace": story_workspace}
+
+    def synthesize_title(self, story):
+        print(f"[{story['index']+1}] Generating voice audio from story title...")
+        buffer, _ = self.make_tts(story).synthesize_buffer(story["fetch"]["title"], story["speed"])
+        return {"buffer": buffer}
+
+    def synthesize_voice(self, story):
+        print(f"[{story['index']+1}] Generating voice audio from story text...")
+        tts = self.make_tts(story)
+        if len(story["fetch"]["text"]) >= self.stream_tts_min_chars:
+            # Long stories are streamed straight into a trimmed mp3 so memory stays flat
+            mp3, duration, timeline = tts.synthesize_stream(story["fetch"]["text"], story["speed"], name="voice", output_format="mp3", silence_threshold=-50.0)
+            return {"mp3": mp3, "duration": duration, "timeline": timeline}
+        if self.tts_workers > 1:
+            buffer, timeline = tts.synthesize_parallel(story["fetch"]["text"], story["speed"], workers=self.tts_workers)
+        else:
+            buffer, timeline = tts.synthesize_buffer(story["fetch"]["text"], story["speed"])
+        return {"buffer": buffer, "timeline": timeline}
+
+    def process_title_audio(self, story):
+        # The synthesized buffer is released once encoded so long batches don't keep every waveform alive
+        buffer = story["synthesize_title"].pop("buffer")
+        trimmed, mp3, _ = self.make_tts(story).process_buffer(buffer, "title", fade_in_duration=200)
+        story["fetch"]["workspace"].record("title_mp3", mp3, duration=trimmed.duration)
+        return {"mp3": mp3, "duration": trimmed.duration}
+
+    def process_voice_audio(self, story):
+        if "mp3" in story["synthesize_voice"]:
+            voice = story["synthesize_voice"]
+            story["fetch"]["workspace"].record("voice_mp3", voice["mp3"], duration=voice["duration"])
+            # WhisperX can read the mp3 directly if the alignment fallback is needed
+            return dict(voice, wav=voice["mp3"])
+
+        buffer = story["synthesize_voice"].pop("buffer")
+        trimmed, mp3, timeline = self.make_tts(story).process_buffer(buffer, "voice", timeline=story["synthesize_voice"]["timeline"])
+        story["fetch"]["workspace"].record("voice_mp3", mp3, duration=trimmed.duration)
+        result = {"mp3": mp3, "duration": trimmed.duration, "timeline": timeline}
+        if not Subtitles.has_word_timings(timeline):
+            # WhisperX alignment reads from disk, so only then is a WAV written
+            result["wav"] = story["fetch"]["workspace"].record("voice_wav", trimmed.write_wav(story["fetch"]["workspace"].path("voice.wav")))
+        return result
+
+    def render_frame(self, story):
+        story_workspace = story["fetch"]["workspace"]
+        image_path = self.frame_renderer.download_frame_image(text=story["fetch"]["title"], output_path=story_workspace.path("reddit_frame_image.png"))
+        return story_workspace.record("frame_image", image_path)
+
+    def build_subtitles(self, story):
+        voice = story["process_voice_audio"]
+        if Subtitles.has_word_timings(voice["timeline"]):
+            subs = voice["timeline"]
+        else:
+            print(f"[{story['index']+1}] TTS timeline incomplete, aligning subtitles with WhisperX...")
+            subs = self.subtitles_generator.align(voice["wav"], self.make_tts(story).normalize(story["fetch"]["text"]))
+        story_workspace = story["fetch"]["workspace"]
+        # VectCut only imports SRT, karaoke ASS is only available when rendering locally
+        subtitle_format = story["style"].get("subtitle_format", self.subtitle_format) if self.render_backend == "ffmpeg" else "srt"
+        subs_path = story_workspace.path(f"subtitles.{subtitle_format}")
+        cues = self.subtitles_generator.generate_subtitles(subs, subs_path, subtitle_format, words_per_subtitle=story["style"].get("words_per_subtitle", 1), audio_duration=voice["duration"])
+        return {"path": story_workspace.record("subtitles", subs_path), "format": subtitle_format, "cues": cues, "timeline": subs}
+
+    def split_parts(self, story):
+        voice = story["process_voice_audio"]
+        subtitles = story["build_subtitles"]
+        parts = plan_parts(subtitles["timeline"], voice["duration"], story["style"].get("part_target_seconds", self.part_target_seconds))
+        if len(parts) == 1:
+            return [dict(parts[0], subtitles=subtitles["path"])]
+
+        # Every part plays a slice of the one narration, only its subtitles are written separately
+        print(f"[{story['index']+1}] Splitting {voice['duration']:.0f}s narration into {len(parts)} parts")
+        story_workspace = story["fetch"]["workspace"]
+        builder = SubtitleBuilder()
+        for part in parts:
+            path = story_workspace.path(f"subtitles_part{part['index']}.{subtitles['format']}")
+            builder.write(part_cues(subtitles["cues"], part), path, subtitles["format"])
+            part["subtitles"] = story_workspace.record(f"subtitles_part{part['index']}", path, start=part["start"], end=part["end"])
+        return parts
+
+    def assemble_video(self, story):
+        return [self.assemble_part(story, part) for part in story["split_parts"]]
+
+    def assemble_part(self, story, part):
+        story_title = story["fetch"]["title"]
+        title_audio = story["process_title_audio"]
+        voice_audio = story["process_voice_audio"]
+        part_duration = part["end"] - part["start"]
+        if part["count"] > 1:
+            print(f"Assembling part {part['index']}/{part['count']}...")
+
+        total_intro_duration = title_audio["duration"] + self.mid_silence_duration + self.hook_duration
+        intro_duration_no_silence = title_audio["duration"] + self.hook_duration
+
+        # The generator holds the current draft id, so every story gets its own
+        if self.render_backend == "ffmpeg":
+            generator = FFmpegVideoGenerator(media_info=self.media_info, preset=self.ffmpeg_preset)
+        else:
+            generator = TikTokVideoGenerator(api_url=f"http://localhost:{self.vectcut_port}", vectcut_dir=self.vectcut_dir, client=self.vectcut_client, media_info=self.media_info)
+
+        print("Generating TikTok video project...")
+        generator.create_project(width=1080, height=1920)
+        generator.begin_batch()
+
+        print("Adding background video...")
+        video_path, video_start, _ = self.background_pool.pick(total_intro_duration + part_duration)
+        generator.add_background_video(video_path=video_path, volume=0, speed=1.0, track_name="main", duration=total_intro_duration + part_duration, start=video_start)
+
+        print("Adding initial image...")
+        generator.add_initial_image(image_path=story["render_frame"], duration=intro_duration_no_silence)
+
+        print("Adding engaging hook audio...")
+        hook_audio_path = os.path.abspath(os.path.join("static", "engaging-hook.mp3"))
+        generator.add_audio(audio_path=hook_audio_path, volume=0.3, track_name="hook", target_start=0)
+
+        print("Adding ding sound...")
+        ding_path = os.path.abspath(os.path.join("static", "ding.mp3"))
+        generator.add_audio(audio_path=ding_path, volume=1.0, track_name="ding", target_start=0.07)
+
+        print("Adding title audio...")
+        generator.add_audio(audio_path=title_audio["mp3"], volume=1.0, track_name="title", target_start=self.hook_duration)
+
+        print("Adding voice audio...")
+        generator.add_audio(audio_path=voice_audio["mp3"], start=part["start"], end=part["end"], volume=1.0, track_name="voice", target_start=total_intro_duration)
+
+        print("Adding subtitles...")
+        generator.add_subtitles(
+            srt_url=part["subtitles"],
+            font_size=36,
+            font_color="#FFFFFF",
+            transform_y=-0.05,
+            time_offset=total_intro_duration,
+        )
+
+        if self.render_backend == "ffmpeg":
+            story_workspace = story["fetch"]["workspace"]
+            name = "video" if part["count"] == 1 else f"video_part{part['index']}"
+            result = generator.render(story_workspace.path(f"{name}.mp4"))
+            if not result.get("success"):
+                raise Exception(f"Failed to render TikTok video: {result.get('error')}")
+            story_workspace.record(name, result["output_path"])
+        else:
+            result = generator.save_and_import_to_capcut(auto_copy=True)
+            # A failed import must fail the stage, otherwise the ledger records the story as produced
+            if not result.get("success"):
+                raise Exception(f"Failed to generate TikTok video project: {result.get('error')}")
+            print("TikTok video project generated and imported to CapCut successfully.")
+
+        return generate_caption(story_title, HASHTAGS, max_length=150, part=part["index"], part_count=part["count"])
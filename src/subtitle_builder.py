@@ -0,0 +1,148 @@
+import numpy as np
+from replacements import DISPLAY_NORMALIZER
+from workspace import atomic_path
+
+PUNCTUATION_BREAKS = (".", ",", "!", "?", ";", ":")
+
+def load_words(result):
+    # Flattens a {"segments": [{"words": [...]}]} result into word texts and start/end arrays (NaN when unaligned)
+    words = [word for segment in result.get("segments", []) for word in segment.get("words", [])]
+    texts = [word.get("word", "").strip() for word in words]
+    starts = np.array([word.get("start", np.nan) for word in words], dtype=np.float64)
+    ends = np.array([word.get("end", np.nan) for word in words], dtype=np.float64)
+    return texts, starts, ends
+
+def interpolate_missing(starts, ends, audio_duration=None):
+    # Words WhisperX could not align get times interpolated by position between their aligned neighbours
+    count = len(starts)
+    if count == 0:
+        return starts, ends
+    positions = np.arange(count)
+    known = ~np.isnan(starts)
+    if not known.any():
+        total = audio_duration if audio_duration else count * 0.3
+        starts = positions * (total / count)
+        return starts, starts + total / count
+    starts = np.interp(positions, positions[known], starts[known])
+    if not known[-1] and audio_duration:
+        # Spread trailing unaligned words up to the end of the audio instead of stacking them on the last one
+        last = np.flatnonzero(known)[-1]
+        tail = count - last
+        starts[last:] = np.linspace(starts[last], audio_duration, tail + 1)[:-1]
+    next_starts = np.append(starts[1:], audio_duration if audio_duration else starts[-1] + 0.3)
+    ends = np.where(np.isnan(ends), next_starts, ends)
+    return starts, np.maximum(ends, starts)
+
+def format_timestamps(seconds, separator=",", ass=False):
+    millis = np.round(np.asarray(seconds, dtype=np.float64) * 1000).astype(np.int64)
+    millis = np.maximum(millis, 0)
+    hrs, rest = np.divmod(millis, 3600000)
+    mins, rest = np.divmod(rest, 60000)
+    secs, millis = np.divmod(rest, 1000)
+    if ass:
+        return [f"{h:d}:{m:02d}:{s:02d}.{ms // 10:02d}" for h, m, s, ms in zip(hrs.tolist(), mins.tolist(), secs.tolist(), millis.tolist())]
+    return [f"{h:02d}:{m:02d}:{s:02d}{separator}{ms:03d}" for h, m, s, ms in zip(hrs.tolist(), mins.tolist(), secs.tolist(), millis.tolist())]
+
+class SubtitleBuilder:
+    # Groups word timings into cues and writes them as SRT or ASS (optionally with per-word karaoke).
+    # Grouping limits can be combined: a new cue starts when the next word would exceed any of them.
+
+    def __init__(self, words_per_subtitle=None, max_chars=None, max_duration=None, break_on_punctuation=False, normalizer=DISPLAY_NORMALIZER):
+        if not any([words_per_subtitle, max_chars, max_duration, break_on_punctuation]):
+            words_per_subtitle = 5
+        self.words_per_subtitle = words_per_subtitle
+        self.max_chars = max_chars
+        self.max_duration = max_duration
+        self.break_on_punctuation = break_on_punctuation
+        self.normalizer = normalizer
+
+    def _group_bounds(self, texts, starts, ends):
+        bounds = []
+        group_start = 0
+        chars = 0
+        for i, text in enumerate(texts):
+            if i > group_start:
+                count = i - group_start
+                if (
+                    (self.words_per_subtitle and count >= self.words_per_subtitle)
+                    or (self.max_chars and chars + 1 + len(text) > self.max_chars)
+                    or (self.max_duration and ends[i] - starts[group_start] > self.max_duration)
+                    or (self.break_on_punctuation and texts[i - 1].endswith(PUNCTUATION_BREAKS))
+                ):
+                    bounds.append((group_start, i))
+                    group_start = i
+                    chars = 0
+            chars += len(text) + (1 if i > group_start else 0)
+        if group_start < len(texts):
+            bounds.append((group_start, len(texts)))
+        return bounds
+
+    def build(self, result, audio_duration=None):
+        texts, starts, ends = load_words(result)
+        starts, ends = interpolate_missing(starts, ends, audio_duration)
+        bounds = self._group_bounds(texts, starts, ends)
+        if not bounds:
+            return []
+
+        # Cues run until the next cue starts so there is never a blank frame between subtitles
+        first = np.array([i for i, _ in bounds])
+        cue_starts = starts[first]
+        last_end = audio_duration if audio_duration is not None else ends[-1]
+        cue_ends = np.append(cue_starts[1:], last_end)
+
+        cues = []
+        for index, ((i, j), start, end) in enumerate(zip(bounds, cue_starts.tolist(), cue_ends.tolist()), 1):
+            text = " ".join(texts[i:j])
+            words = texts[i:j]
+            if self.normalizer is not None:
+                text = self.normalizer.apply(text)
+                # Karaoke highlights word by word, so multi-word phrases only get abbreviated in the plain text
+                words = [self.normalizer.apply(word) for word in words]
+            cues.append({
+                "index": index,
+                "start": start,
+                "end": end,
+                "text": text.strip(),
+                "words": [{"word": word, "start": float(starts[k]), "end": float(ends[k])} for k, word in enumerate(words, i)],
+            })
+        return cues
+
+    def to_srt(self, cues):
+        starts = format_timestamps([cue["start"] for cue in cues])
+        ends = format_timestamps([cue["end"] for cue in cues])
+        return "".join(f"{cue['index']}\n{start} --> {end}\n{cue['text']}\n\n" for cue, start, end in zip(cues, starts, ends))
+
+    def to_ass(self, cues, font="Nunito", font_size=72, primary_color="&H00FFFFFF", highlight_color="&H0000D7FF", outline=4, margin_v=860, play_res=(1080, 1920), karaoke=True):
+        # With karaoke, \\k tags fill each word with the primary colour as it is spoken
+        header = (
+            "[Script Info]\n"
+            "ScriptType: v4.00+\n"
+            f"PlayResX: {play_res[0]}\n"
+            f"PlayResY: {play_res[1]}\n"
+            "WrapStyle: 0\n\n"
+            "[V4+ Styles]\n"
+            "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, "
+            "ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding\n"
+            f"Style: Default,{font},{font_size},{primary_color if not karaoke else highlight_color},{primary_color},&H00000000,&H00000000,"
+            f"-1,0,0,0,100,100,0,0,1,{outline},0,2,40,40,{margin_v},1\n\n"
+            "[Events]\n"
+            "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+        )
+        starts = format_timestamps([cue["start"] for cue in cues], ass=True)
+        ends = format_timestamps([cue["end"] for cue in cues], ass=True)
+        lines = []
+        for cue, start, end in zip(cues, starts, ends):
+            if karaoke and len(cue["words"]) > 1:
+                word_starts = np.array([word["start"] for word in cue["words"]] + [cue["end"]])
+                durations = np.maximum(np.round(np.diff(word_starts) * 100).astype(np.int64), 0).tolist()
+                text = " ".join(f"{{\\k{duration}}}{word['word']}" for word, duration in zip(cue["words"], durations))
+            else:
+                text = cue["text"]
+            lines.append(f"Dialogue: 0,{start},{end},Default,,0,0,0,,{text}\n")
+        return header + "".join(lines)
+
+    def write(self, cues, output_path, format="srt", **ass_options):
+        content = self.to_ass(cues, **ass_options) if format == "ass" else self.to_srt(cues)
+        with atomic_path(output_path) as tmp_path, open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return output_path
@@ -1,105 +1,172 @@
-import re
-import whisperx
-import torch
-
-# Monkey-patch torch.load to use weights_only=False for compatibility
-_original_torch_load = torch.load
-
-def patched_torch_load(*args, **kwargs):
-    # Force weights_only=False to allow loading older checkpoints
-    kwargs['weights_only'] = False
-    return _original_torch_load(*args, **kwargs)
-
-torch.load = patched_torch_load
+import contextlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import traced
+from replacements import DISPLAY_NORMALIZER
+from subtitle_builder import SubtitleBuilder
+from workspace import file_sha256
+
+SAMPLE_RATE = 16000  # whisperx.load_audio always resamples to 16 kHz
+LANGUAGE = "en"
+
+_torch_load_lock = threading.Lock()
+
+@contextlib.contextmanager
+def legacy_torch_load():
+    # The pyannote VAD and wav2vec2 checkpoints predate torch's weights_only=True default.
+    # torch.load is only patched while whisperx loads them, never for the rest of the process.
+    import torch
+    with _torch_load_lock:
+        original_torch_load = torch.load
+
+        def patched_torch_load(*args, **kwargs):
+            kwargs['weights_only'] = False
+            return original_torch_load(*args, **kwargs)
+
+        torch.load = patched_torch_load
+        try:
+            yield
+        finally:
+            torch.load = original_torch_load
 
 class Subtitles:
-    def __init__(self, result_folder="results", device="cpu", compute_type="int8"):
+    def __init__(self, result_folder="results", device="cpu", compute_type="int8", cache=None):
         self.result_folder = result_folder
+        self.cache = cache
         self.device = device
         self.compute_type = compute_type
-        self.model = whisperx.load_model("base", device=self.device, compute_type=self.compute_type)
-        self.align_model, self.metadata = whisperx.load_align_model(language_code="en", device=self.device)
-
-    def transcribe(self, audio_path):
-        audio = whisperx.load_audio(audio_path)
-        
-        result = self.model.transcribe(audio_path, batch_size=16, language="en")
-        result = whisperx.align(result["segments"], self.align_model, self.metadata, audio, device=self.device)
-        
+        self._model = None
+        self._align = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def model(self):
+        # The ASR model is only needed when no word timeline comes from TTS, so load it on first use
+        with self._load_lock:
+            if self._model is None:
+                import whisperx
+                with legacy_torch_load():
+                    self._model = whisperx.load_model("base", device=self.device, compute_type=self.compute_type, language=LANGUAGE)
+        return self._model
+
+    def _align_model(self):
+        # Only the WhisperX fallback and transcription need it; cache hits and TTS timelines never do
+        with self._load_lock:
+            if self._align is None:
+                import whisperx
+                with legacy_torch_load():
+                    self._align = whisperx.load_align_model(language_code=LANGUAGE, device=self.device)
+        return self._align
+
+    @staticmethod
+    def has_word_timings(result):
+        words = [w for segment in result.get("segments", []) for w in segment.get("words", [])]
+        return bool(words) and all("start" in w and "end" in w for w in words)
+
+    def _cached(self, stage, key_parts, create):
+        if self.cache is None:
+            return create()
+        key = self.cache.key(stage, *key_parts())
+        entry = self.cache.get(stage, key)
+        if entry is not None:
+            return entry.meta["result"]
+        result = create()
+        self.cache.put(stage, key, meta={"result": result})
         return result
-    
-    def _format_timestamp(self, seconds):
-        hrs = int(seconds // 3600)
-        mins = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        millis = int((seconds - int(seconds)) * 1000)
-        return f"{hrs:02d}:{mins:02d}:{secs:02d},{millis:03d}"
-    
-    def abbreviations(self, text: str) -> str:
-        ABBREVIATIONS = {
-            "mister": "Mr.",
-            "misses": "Mrs.",
-            "doctor": "Dr.",
-            "saint": "St.",
-            "versus": "vs.",
-            "et cetera": "etc.",
-            "for example": "e.g.",
-            "that is": "i.e.",
-            "am i the asshole": "AITA"
-        }
-        def replace(match):
-            phrase = match.group(0)
-            key = phrase.lower()
-            abbr = ABBREVIATIONS[key]
-    
-            if phrase.isupper():
-                return abbr.upper()
-            elif phrase[0].isupper():
-                return abbr
-            else:
-                return abbr.lower()
-    
-        pattern = r"\b(" + "|".join(
-            re.escape(k) for k in sorted(ABBREVIATIONS, key=len, reverse=True)
-        ) + r")\b"
-    
-        return re.sub(pattern, replace, text, flags=re.IGNORECASE)
-
-
-    def generate_srt(self, result, output_path, words_per_subtitle=5, audio_duration=None):
-        with open(output_path, "w", encoding="utf-8") as f:
-            subtitle_index = 1
-
-            all_words = []
-            for segment in result["segments"]:
-                if "words" in segment:
-                    all_words.extend(segment["words"])
 
-            i = 0
-            while i < len(all_words):
-                words_group = all_words[i:i + words_per_subtitle]
+    @traced("subtitles.align")
+    def align(self, audio_path, transcript):
+        # Forced alignment against the known transcript, skipping the ASR pass
+        def create():
+            import whisperx
+            align_model, metadata = self._align_model()
+            audio = whisperx.load_audio(audio_path)
+            duration = len(audio) / SAMPLE_RATE
+            segments = [{"text": transcript, "start": 0.0, "end": duration}]
+            return whisperx.align(segments, align_model, metadata, audio, device=self.device)
 
-                if not words_group:
-                    break
+        return self._cached("align", lambda: [file_sha256(audio_path), transcript, LANGUAGE], create)
 
-                start_time = words_group[0]["start"]
-                
-                if i + words_per_subtitle < len(all_words):
-                    end_time = all_words[i + words_per_subtitle]["start"]
-                else:
-                    end_time = audio_duration if audio_duration is not None else words_group[-1]["end"]
-
-                raw_text = " ".join([w["word"] for w in words_group])
-                text = self.abbreviations(raw_text).strip()
+    def transcribe(self, audio_path):
+        return self.transcribe_many([audio_path])[0]
+
+    def _vad_segments(self, audio, chunk_size):
+        # Same VAD + chunk merging that FasterWhisperPipeline.transcribe does before batching
+        vad_model = self.model.vad_model
+        preprocess = getattr(vad_model, "preprocess_audio", None)
+        merge_chunks = getattr(vad_model, "merge_chunks", None)
+        if preprocess is None or merge_chunks is None:
+            from whisperx.vads import Pyannote
+            preprocess, merge_chunks = Pyannote.preprocess_audio, Pyannote.merge_chunks
+        vad_params = self.model._vad_params
+        segments = vad_model({"waveform": preprocess(audio), "sample_rate": SAMPLE_RATE})
+        return merge_chunks(segments, chunk_size, onset=vad_params["vad_onset"], offset=vad_params["vad_offset"])
+
+    @traced("subtitles.transcribe")
+    def transcribe_many(self, audio_paths, batch_size=16, chunk_size=30, load_workers=4):
+        # Transcribes several stories in one model pass: VAD segments from every file are packed into
+        # full batches for Whisper, then each story is aligned with the resident align model.
+        results = [None] * len(audio_paths)
+        keys = [None] * len(audio_paths)
+        pending = []
+        for i, audio_path in enumerate(audio_paths):
+            if self.cache is not None:
+                keys[i] = self.cache.key("transcribe", file_sha256(audio_path), "base", self.compute_type, LANGUAGE)
+                entry = self.cache.get("transcribe", keys[i])
+                if entry is not None:
+                    results[i] = entry.meta["result"]
+                    continue
+            pending.append(i)
+
+        if not pending:
+            return results
+
+        import whisperx
+        align_model, metadata = self._align_model()
+        with ThreadPoolExecutor(max_workers=load_workers) as executor:
+            audios = list(executor.map(whisperx.load_audio, [audio_paths[i] for i in pending]))
+
+        vad_segments = [self._vad_segments(audio, chunk_size) for audio in audios]
+
+        def inputs():
+            for audio, segments in zip(audios, vad_segments):
+                for segment in segments:
+                    yield {"inputs": audio[int(segment["start"] * SAMPLE_RATE):int(segment["end"] * SAMPLE_RATE)]}
+
+        texts = []
+        for out in self.model(inputs(), batch_size=batch_size):
+            text = out["text"]
+            if batch_size in [0, 1, None]:
+                text = text[0]
+            texts.append(text)
+
+        position = 0
+        for i, audio, segments in zip(pending, audios, vad_segments):
+            story_segments = []
+            for segment in segments:
+                story_segments.append({"text": texts[position], "start": round(segment["start"], 3), "end": round(segment["end"], 3)})
+                position += 1
+            result = whisperx.align(story_segments, align_model, metadata, audio, device=self.device)
+            if self.cache is not None:
+                self.cache.put("transcribe", keys[i], meta={"result": result})
+            results[i] = result
+        return results
+    
+    def abbreviations(self, text: str) -> str:
+        return DISPLAY_NORMALIZER.apply(text)
 
-                f.write(f"{subtitle_index}\n")
-                f.write(f"{self._format_timestamp(start_time)} --> {self._format_timestamp(end_time)}\n")
-                f.write(f"{text}\n\n")
 
-                subtitle_index += 1
-                i += words_per_subtitle
+    def generate_srt(self, result, output_path, words_per_subtitle=5, audio_duration=None, max_chars=None, max_duration=None, break_on_punctuation=False):
+        return self.generate_subtitles(result, output_path, "srt", words_per_subtitle, audio_duration, max_chars, max_duration, break_on_punctuation)
 
-        print(f"SRT file generated at: {output_path}")
+    @traced("subtitles.generate")
+    def generate_subtitles(self, result, output_path, format="srt", words_per_subtitle=5, audio_duration=None, max_chars=None, max_duration=None, break_on_punctuation=False, **ass_options):
+        # Returns the cues as well so callers don't have to re-parse the written file
+        builder = SubtitleBuilder(words_per_subtitle, max_chars, max_duration, break_on_punctuation)
+        cues = builder.build(result, audio_duration)
+        builder.write(cues, output_path, format, **ass_options)
+        print(f"{format.upper()} file generated at: {output_path}")
+        return cues
 
 
 if __name__ == "__main__":
@@ -108,11 +175,14 @@ if __name__ == "__main__":
     load_dotenv()
 
     subtitles = Subtitles()
+    # AUDIO_FILE may list several files separated by commas; they are transcribed in one batched pass
     AUDIO_FILE = os.getenv("AUDIO_FILE")
     print("AUDIO_FILE:", AUDIO_FILE)
-    if not AUDIO_FILE or not os.path.isfile(AUDIO_FILE):
+    audio_files = [path.strip() for path in (AUDIO_FILE or "").split(",") if path.strip()]
+    if not audio_files or not all(os.path.isfile(path) for path in audio_files):
         raise FileNotFoundError("AUDIO_FILE environment variable is not set or file does not exist.")
     print("Performing transcription and alignment...")
-    result = subtitles.transcribe(AUDIO_FILE)
-    subtitles.generate_srt(result, "output.srt")
+    results = subtitles.transcribe_many(audio_files)
+    for i, result in enumerate(results):
+        subtitles.generate_srt(result, "output.srt" if len(results) == 1 else f"output_{i+1}.srt")
     print("Done.")
@@ -2,29 +2,49 @@ import json
 import os
 import shutil
 import subprocess
-import requests
 import random
+from instrumentation import traced
+from vectcut_client import VectCutClient
 
 class TikTokVideoGenerator:
-    def __init__(self, api_url="http://localhost:9001", vectcut_dir="vectcut"):
+    def __init__(self, api_url="http://localhost:9001", vectcut_dir="vectcut", client=None, media_info=None):
         self.api_url = api_url
         self.vectcut_dir = vectcut_dir
+        self.client = client or VectCutClient(api_url)
+        self.media_info = media_info
         self.draft_id = None
+        self._batch = None
+        self._batch_messages = []
 
+    @traced(lambda self, endpoint, data: f"vectcut.{endpoint}", bytes_of=None)
     def _make_request(self, endpoint, data):
-        url = f"{self.api_url}/{endpoint}"
-        headers = {"Content-Type": "application/json"}
+        if self._batch is not None:
+            self._batch.append((endpoint, data))
+            return {}
+        return self.client.request(endpoint, data)
 
-        try:
-            response = requests.post(url, json=data, headers=headers)
-            response.raise_for_status()
-            result = response.json()
-            if not result.get("success"):
-                err = result.get("error", "Unknown error")
-                raise Exception(f"API Error: {err}")
-            return result.get("output", {})
-        except requests.RequestException as e:
-            raise Exception(f"Request to {endpoint} failed: {str(e)}")
+    def begin_batch(self):
+        # Track additions are queued until flush() instead of one round-trip per add_* call
+        if not self.draft_id:
+            raise Exception("Draft ID is not set. Create a project first.")
+        self._batch = []
+        self._batch_messages = []
+
+    def _report(self, message):
+        # While batching, success is only reported once flush() has sent the calls
+        if self._batch is not None:
+            self._batch_messages.append(message)
+        else:
+            print(message)
+
+    @traced("vectcut.flush", bytes_of=None)
+    def flush(self):
+        calls, self._batch = self._batch or [], None
+        messages, self._batch_messages = self._batch_messages, []
+        results = self.client.send_batch(calls)
+        for message in messages:
+            print(message)
+        return results
 
     def create_project(self, width=1080, height=1920):
         response = self._make_request("create_draft", {
@@ -37,6 +57,8 @@ class TikTokVideoGenerator:
         return self.draft_id
     
     def _get_video_duration(self, video_path):
+        if self.media_info is not None:
+            return self.media_info.duration(video_path)
         try:
             result = subprocess.run(
                 ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "json", video_path],
@@ -53,7 +75,7 @@ class TikTokVideoGenerator:
         except (KeyError, ValueError, json.JSONDecodeError) as e:
             raise Exception(f"Error parsing ffprobe output: {str(e)}")
 
-    def add_background_video(self, video_path, volume=0, speed=1.0, track_name="main", duration=None):
+    def add_background_video(self, video_path, volume=0, speed=1.0, track_name="main", duration=None, start=None):
         if not self.draft_id:
             raise Exception("Draft ID is not set. Create a project first.")
         
@@ -63,8 +85,9 @@ class TikTokVideoGenerator:
         else:
             duration = min(duration, original_duration - 5)
 
-        # Random start time calculation (to fit within original video duration)
-        start = random.choices(range(5, int(original_duration - duration + 1)))[0]
+        if start is None:
+            # Random start time calculation (to fit within original video duration)
+            start = random.choices(range(5, int(original_duration - duration + 1)))[0]
         end = start + duration
 
         data = {
@@ -88,7 +111,7 @@ class TikTokVideoGenerator:
         
         response = self._make_request("add_video", data)
 
-        print(f"Background video added successfully: {os.path.basename(video_path)}")
+        self._report(f"Background video added successfully: {os.path.basename(video_path)}")
         return response, duration
     
     def add_initial_image(self, image_path, duration=3.0):
@@ -107,7 +130,7 @@ class TikTokVideoGenerator:
         }
 
         response = self._make_request("add_image", data)
-        print(f"Initial image added successfully: {os.path.basename(image_path)}")
+        self._report(f"Initial image added successfully: {os.path.basename(image_path)}")
         return response
 
     def add_audio(self, audio_path, start=0, end=None, target_start=0, volume=1.0, speed=1.0, track_name="voice"):
@@ -128,7 +151,7 @@ class TikTokVideoGenerator:
             data["end"] = end
 
         response = self._make_request("add_audio", data)
-        print(f"Voice audio added successfully: {os.path.basename(audio_path)}")
+        self._report(f"Voice audio added successfully: {os.path.basename(audio_path)}")
         return response
     
     def  add_subtitles(self, srt_url, time_offset=0, font="Nunito", font_size=5, font_color="#FFFFFF", transform_y=-0.8, scale=0.8):
@@ -152,7 +175,7 @@ class TikTokVideoGenerator:
         }
 
         response = self._make_request("add_subtitle", data)
-        print(f"Subtitles added successfully from: {os.path.basename(srt_url)}")
+        self._report(f"Subtitles added successfully from: {os.path.basename(srt_url)}")
         return response
     
     def _find_draft_dir(self):
@@ -184,6 +207,9 @@ class TikTokVideoGenerator:
         if not self.draft_id:
             raise Exception("Draft ID is not set. Create a project first.")
         
+        # Queued track additions are sent first so they reach the draft whatever happens next
+        self.flush()
+
         user_home = os.path.expanduser("~")
         capcut_draft_dir = os.path.join(user_home, "AppData", "Local", "CapCut", "User Data", "Projects", "com.lveditor.draft")
 
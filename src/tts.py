@@ -1,16 +1,318 @@
+import copy
+import functools
+import hashlib
+import io
+import multiprocessing
 import re
-from kokoro import KPipeline
+import threading
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import soundfile as sf
 import os
 import subprocess
-from pydub import AudioSegment
-from pydub.silence import detect_leading_silence
-from replacements import CURSE_WORDS_PATTERN, PATTERN, ABBREVIATIONS
+from instrumentation import traced
+from replacements import TTS_NORMALIZER
+from workspace import atomic_path, file_sha256
+
+DEFAULT_LANG_CODE = "a"
+DEFAULT_REPO_ID = "hexgrad/Kokoro-82M"
+SAMPLE_RATE = 24000
+
+ENGLISH_LANG_CODES = ("a", "b")
+
+def voice_name_for(gender, voice=None, lang_code=DEFAULT_LANG_CODE):
+    # Kokoro voice id, e.g. af_heart; the default voice depends on the narrator's gender
+    if gender not in ["f", "m"]:
+        raise ValueError("Gender must be 'f' or 'm'.")
+    return f"{lang_code}{gender}_{voice or ('heart' if gender == 'f' else 'adam')}"
+
+# Process-wide registry: one KPipeline per (lang_code, repo_id) and one voice tensor per voice name
+_pipelines = {}
+_voices = {}
+_registry_lock = threading.Lock()
+
+def get_pipeline(lang_code=DEFAULT_LANG_CODE, repo_id=DEFAULT_REPO_ID):
+    key = (lang_code, repo_id)
+    with _registry_lock:
+        pipeline = _pipelines.get(key)
+        if pipeline is None:
+            # kokoro pulls in torch and spacy, so it is imported on the first pipeline rather than with this module
+            from kokoro import KPipeline
+            pipeline = KPipeline(lang_code=lang_code, repo_id=repo_id)
+            _pipelines[key] = pipeline
+    return pipeline
+
+def get_voice(voice, lang_code=DEFAULT_LANG_CODE, repo_id=DEFAULT_REPO_ID):
+    pipeline = get_pipeline(lang_code, repo_id)
+    key = (lang_code, repo_id, voice)
+    with _registry_lock:
+        pack = _voices.get(key)
+        if pack is None:
+            pack = pipeline.load_voice(voice)
+            _voices[key] = pack
+    return pack
+
+def warm_up(voices=("af_heart",), lang_code=DEFAULT_LANG_CODE, repo_id=DEFAULT_REPO_ID):
+    get_pipeline(lang_code, repo_id)
+    for voice in voices:
+        get_voice(voice, lang_code, repo_id)
+
+# Worker process pools for parallel synthesis, one per (workers, torch_threads, lang_code, repo_id)
+_process_pools = {}
+
+def _init_tts_worker(lang_code, repo_id, torch_threads):
+    import torch
+    torch.set_num_threads(torch_threads)
+    get_pipeline(lang_code, repo_id)
+
+def _synthesize_chunk(text, voice_name, speed, lang_code, repo_id):
+    pipeline = get_pipeline(lang_code, repo_id)
+    voice = get_voice(voice_name, lang_code, repo_id)
+    all_audio = []
+    words = []
+    offset = 0.0
+    for result in pipeline(text, voice=voice, speed=speed):
+        if result.audio is None:
+            continue
+        audio = np.asarray(result.audio, dtype=np.float32).reshape(-1)
+        all_audio.append(audio)
+        words.extend(_timeline_words(result.tokens, offset))
+        offset += len(audio) / SAMPLE_RATE
+    audio = np.concatenate(all_audio) if all_audio else np.zeros(0, dtype=np.float32)
+    return audio, words
+
+def get_process_pool(workers, torch_threads=None, lang_code=DEFAULT_LANG_CODE, repo_id=DEFAULT_REPO_ID):
+    if torch_threads is None:
+        torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    key = (workers, torch_threads, lang_code, repo_id)
+    with _registry_lock:
+        pool = _process_pools.get(key)
+        if pool is None:
+            # Spawned, not forked: the parent is multi-threaded and may hold _registry_lock or torch's thread pool
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_tts_worker, initargs=(lang_code, repo_id, torch_threads))
+            _process_pools[key] = pool
+    return pool
+
+def shutdown_process_pools():
+    with _registry_lock:
+        pools = list(_process_pools.values())
+        _process_pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+def split_text(text, max_chars=400):
+    # Sentence/paragraph chunks of up to max_chars, so each worker gets a sizeable piece
+    sentences = [sentence.strip() for sentence in re.split(r"(?<=[.!?])\s+|\n{2,}", text) if sentence.strip()]
+    chunks = []
+    current = ""
+    for sentence in sentences:
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _timeline_words(tokens, offset):
+    words = []
+    prefix = ""
+    for token in tokens or []:
+        text = token.text
+        if not any(c.isalnum() for c in text):
+            # Punctuation is glued to its neighbour instead of becoming its own subtitle word
+            if words:
+                words[-1]["word"] += text
+            else:
+                prefix += text
+            continue
+        if token.start_ts is None or token.end_ts is None:
+            words.append({"word": prefix + text})
+        else:
+            words.append({"word": prefix + text, "start": round(offset + token.start_ts, 3), "end": round(offset + token.end_ts, 3)})
+        prefix = ""
+    return words
+
+@functools.lru_cache(maxsize=32)
+def phonemize(text, lang_code=DEFAULT_LANG_CODE, repo_id=DEFAULT_REPO_ID):
+    # Kokoro's English G2P cut into the same (graphemes, phonemes, tokens) chunks KPipeline.__call__ feeds
+    # the model. Cached so every voice/speed of one text shares it; Kokoro writes timestamps into the
+    # tokens, so callers copy them before inference.
+    if lang_code not in ENGLISH_LANG_CODES:
+        raise ValueError(f"Shared phonemization is only available for English (lang_code 'a' or 'b'), not '{lang_code}'.")
+    pipeline = get_pipeline(lang_code, repo_id)
+    chunks = []
+    for graphemes in re.split(r"\n+", text):
+        _, tokens = pipeline.g2p(graphemes)
+        for chunk_graphemes, phonemes, chunk_tokens in pipeline.en_tokenize(tokens):
+            if phonemes:
+                # KModel's context is 510 phonemes, KPipeline truncates the same way
+                chunks.append((chunk_graphemes, phonemes[:510], tuple(chunk_tokens)))
+    return tuple(chunks)
+
+def _join_chunks(chunks):
+    # (graphemes, audio, tokens) per Kokoro chunk -> one AudioBuffer and its word timeline
+    all_audio = []
+    segments = []
+    offset = 0.0
+    for graphemes, audio, tokens in chunks:
+        if audio is None:
+            continue
+        all_audio.append(audio)
+        chunk_duration = len(audio) / SAMPLE_RATE
+        segments.append({
+            "text": graphemes,
+            "start": round(offset, 3),
+            "end": round(offset + chunk_duration, 3),
+            "words": _timeline_words(tokens, offset),
+        })
+        offset += chunk_duration
+    return AudioBuffer(np.concatenate(all_audio) if all_audio else np.zeros(0, dtype=np.float32)), {"segments": segments}
+
+def shift_timeline(timeline, offset, duration=None):
+    segments = []
+    for segment in timeline["segments"]:
+        words = []
+        for word in segment.get("words", []):
+            word = dict(word)
+            for key in ("start", "end"):
+                if key in word:
+                    value = max(0.0, word[key] - offset)
+                    if duration is not None:
+                        value = min(value, duration)
+                    word[key] = round(value, 3)
+            words.append(word)
+        shifted = dict(segment, words=words)
+        for key in ("start", "end"):
+            if key in shifted:
+                value = max(0.0, shifted[key] - offset)
+                if duration is not None:
+                    value = min(value, duration)
+                shifted[key] = round(value, 3)
+        segments.append(shifted)
+    return {"segments": segments}
+
+class AudioBuffer:
+    # Mono float32 audio kept in memory between synthesis, trimming, fading and the final encode
+
+    def __init__(self, samples, sample_rate=SAMPLE_RATE):
+        self.samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        self.sample_rate = sample_rate
+
+    def __len__(self):
+        return len(self.samples)
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    @classmethod
+    def from_file(cls, path):
+        samples, sample_rate = sf.read(path, dtype="float32", always_2d=True)
+        return cls(samples.mean(axis=1), sample_rate)
+
+    def silence_bounds(self, silence_threshold=-50.0, chunk_size=10):
+        # Same rule as pydub's detect_leading_silence (chunk_size ms chunks, dBFS against full scale),
+        # evaluated for every chunk at once so trailing silence needs no reversed copy
+        if len(self.samples) == 0:
+            return 0, 0
+        chunk = max(1, int(self.sample_rate * chunk_size / 1000))
+        starts = np.arange(0, len(self.samples), chunk)
+        energy = np.add.reduceat(np.square(self.samples, dtype=np.float64), starts)
+        counts = np.diff(np.append(starts, len(self.samples)))
+        with np.errstate(divide="ignore"):
+            dbfs = 10 * np.log10(energy / counts)
+        loud = np.flatnonzero(dbfs >= silence_threshold)
+        if len(loud) == 0:
+            return len(self.samples), len(self.samples)
+        return int(starts[loud[0]]), int(min(len(self.samples), starts[loud[-1]] + chunk))
+
+    def trim_silence(self, silence_threshold=-50.0):
+        # Returns the trimmed buffer (a view, no copy) and the seconds removed from the start
+        start, end = self.silence_bounds(silence_threshold)
+        return AudioBuffer(self.samples[start:end], self.sample_rate), start / self.sample_rate
+
+    def fade(self, fade_in_duration=500, fade_out_duration=500, from_gain=-120.0):
+        # Gain ramps linearly in amplitude from from_gain (dB) like pydub's fade_in/fade_out, which step
+        # from the floor towards full volume; durations are in milliseconds
+        duration_ms = int(self.duration * 1000)
+        fade_in = int(min(fade_in_duration, duration_ms // 2) * self.sample_rate / 1000)
+        fade_out = int(min(fade_out_duration, duration_ms // 2) * self.sample_rate / 1000)
+        floor = 10.0 ** (from_gain / 20)
+        samples = self.samples.copy()
+        if fade_in > 0:
+            samples[:fade_in] *= (floor + (1.0 - floor) * np.arange(fade_in) / fade_in).astype(np.float32)
+        if fade_out > 0:
+            samples[-fade_out:] *= (1.0 - (1.0 - floor) * np.arange(fade_out) / fade_out).astype(np.float32)
+        return AudioBuffer(samples, self.sample_rate)
+
+    def write_wav(self, output_path):
+        with atomic_path(output_path) as tmp_path:
+            sf.write(tmp_path, self.samples, samplerate=self.sample_rate)
+        return os.path.abspath(output_path)
+
+    @traced("audio.encode")
+    def encode(self, output_path, codec="libmp3lame", bitrate="192k", cache=None):
+        # Streams raw PCM to a single ffmpeg process over stdin; no intermediate WAV is written
+        def create():
+            with atomic_path(output_path) as tmp_path:
+                subprocess.run([
+                    "ffmpeg",
+                    "-y",
+                    "-f", "f32le",
+                    "-ar", str(self.sample_rate),
+                    "-ac", "1",
+                    "-i", "pipe:0",
+                    "-codec:a", codec,
+                    "-b:a", bitrate,
+                    tmp_path
+                ], input=self.samples.astype("<f4").tobytes(), check=True, stderr=subprocess.DEVNULL)
+            return {"duration": self.duration}
+
+        if cache is None:
+            create()
+        else:
+            key = cache.key("encode", hashlib.sha256(self.samples.tobytes()).hexdigest(), self.sample_rate, codec, bitrate)
+            cache.fetch_or_create("encode", key, output_path, create)
+        return os.path.abspath(output_path)
+
+class _WavSink:
+    def __init__(self, path, sample_rate):
+        self.file = sf.SoundFile(path, "w", samplerate=sample_rate, channels=1, subtype="PCM_16")
+
+    def write(self, samples):
+        self.file.write(samples)
+
+    def close(self):
+        self.file.close()
+
+class _FfmpegSink:
+    # Feeds PCM chunks to a running ffmpeg encoder as they are produced
+    def __init__(self, path, sample_rate, codec="libmp3lame", bitrate="192k"):
+        self.process = subprocess.Popen([
+            "ffmpeg",
+            "-y",
+            "-f", "f32le",
+            "-ar", str(sample_rate),
+            "-ac", "1",
+            "-i", "pipe:0",
+            "-codec:a", codec,
+            "-b:a", bitrate,
+            path
+        ], stdin=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def write(self, samples):
+        self.process.stdin.write(samples.astype("<f4").tobytes())
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise subprocess.CalledProcessError(self.process.returncode, "ffmpeg")
 
 class TTS:
 
-    def __init__(self, result_folder = "results", gender="f", voice=None):
+    def __init__(self, result_folder = "results", gender="f", voice=None, lang_code=DEFAULT_LANG_CODE, repo_id=DEFAULT_REPO_ID, cache=None):
         if gender not in ["f", "m"]:
             raise ValueError("Gender must be 'f' or 'm'.")
         if voice is None:
@@ -21,8 +323,27 @@ class TTS:
         self.gender = gender
         self.voice = voice
         self.result_folder = result_folder
+        self.lang_code = lang_code
+        self.repo_id = repo_id
+        self.cache = cache
+
+    def _cached(self, stage, key_parts, output_path, create):
+        # create() writes output_path and returns metadata; with a cache, unchanged inputs skip it entirely.
+        # key_parts is a callable so inputs are only hashed when a cache is configured.
+        if self.cache is None:
+            return create()
+        key = self.cache.key(stage, *key_parts())
+        return self.cache.fetch_or_create(stage, key, output_path, create)
+
+    @property
+    def voice_name(self):
+        return voice_name_for(self.gender, self.voice, self.lang_code)
+
+    def warm_up(self):
+        warm_up([self.voice_name], lang_code=self.lang_code, repo_id=self.repo_id)
 
-    def trim_silence(self, audio_path, output_path=None, silence_threshold=-50.0):
+    @traced("tts.trim_silence")
+    def trim_silence(self, audio_path, output_path=None, silence_threshold=-50.0, timeline=None):
         if not os.path.exists(audio_path):
             raise FileNotFoundError(f"Input audio file not found: {audio_path}")
         
@@ -31,18 +352,30 @@ class TTS:
         if output_path is None:
             output_path = audio_path.replace(f".{input_ext}", f"_trimmed.{input_ext}")
         
-        sound = AudioSegment.from_file(audio_path, format=input_ext)
+        def create():
+            from pydub import AudioSegment
+            from pydub.silence import detect_leading_silence
+            sound = AudioSegment.from_file(audio_path, format=input_ext)
+
+            start_trim = detect_leading_silence(sound, silence_threshold=silence_threshold)
+            end_trim = detect_leading_silence(sound.reverse(), silence_threshold=silence_threshold)
+
+            duration = len(sound)
+            trimmed_sound = sound[start_trim:duration - end_trim]
 
-        start_trim = detect_leading_silence(sound, silence_threshold=silence_threshold)
-        end_trim = detect_leading_silence(sound.reverse(), silence_threshold=silence_threshold)
+            with atomic_path(output_path) as tmp_path:
+                trimmed_sound.export(tmp_path, format=input_ext)
 
-        duration = len(sound)
-        trimmed_sound = sound[start_trim:duration - end_trim]
+            return {"start_trim": start_trim, "duration": len(trimmed_sound) / 1000.0}  # duration in seconds
 
-        trimmed_sound.export(output_path, format=input_ext)
+        meta = self._cached("trim_silence", lambda: [file_sha256(audio_path), silence_threshold, input_ext], output_path, create)
 
-        return output_path, len(trimmed_sound) / 1000.0  # duration in seconds
+        trimmed_duration = meta["duration"]
+        if timeline is not None:
+            return output_path, trimmed_duration, shift_timeline(timeline, meta["start_trim"] / 1000.0, trimmed_duration)
+        return output_path, trimmed_duration
     
+    @traced("tts.add_fade")
     def add_fade(self, audio_path, output_path=None, fade_in_duration=500, fade_out_duration=500):
         if not os.path.exists(audio_path):
             raise FileNotFoundError(f"Input audio file not found: {audio_path}")
@@ -52,6 +385,13 @@ class TTS:
         if output_path is None:
             output_path = audio_path.replace(f".{input_ext}", f"_faded.{input_ext}")
         
+        self._cached("add_fade", lambda: [file_sha256(audio_path), input_ext, fade_in_duration, fade_out_duration], output_path,
+                     lambda: self._fade(audio_path, output_path, input_ext, fade_in_duration, fade_out_duration))
+
+        return output_path
+
+    def _fade(self, audio_path, output_path, input_ext, fade_in_duration, fade_out_duration):
+        from pydub import AudioSegment
         sound = AudioSegment.from_file(audio_path, format=input_ext)
 
         audio_duration = len(sound)
@@ -82,49 +422,247 @@ class TTS:
         else:
             export_params = {'format': input_ext}
         
-        faded_sound.export(output_path, **export_params)
+        with atomic_path(output_path) as tmp_path:
+            faded_sound.export(tmp_path, **export_params)
 
-        return output_path
+        return {"duration": len(faded_sound) / 1000.0}
 
     def _expand_abbreviations(self, text):
-        def replacer(match):
-            abbr = match.group(0)
-            full = ABBREVIATIONS.get(abbr.lower())
-            if abbr.isupper():
-                return full.upper()
-            elif abbr.istitle():
-                return full.title()
+        return TTS_NORMALIZER.apply(text)
+
+    def normalize(self, text):
+        return self._expand_abbreviations(text)
+
+    @traced("tts.synthesize")
+    def synthesize(self, text, speed=1.15, name="output", with_timeline=False):
+        buffer, timeline = self.synthesize_buffer(text, speed)
+        output_path = buffer.write_wav(os.path.join(self.result_folder, f"{name}.wav"))
+        if with_timeline:
+            return output_path, buffer.duration, timeline
+        return output_path, buffer.duration
+
+    def _load_synthesis(self, text, voice_name, speed):
+        # Returns (key, cached (AudioBuffer, timeline) or None); synthesize_buffer and synthesize_variants share entries
+        if self.cache is None:
+            return None, None
+        key = self.cache.key("synthesize", text, voice_name, speed, self.repo_id)
+        entry = self.cache.get("synthesize", key)
+        if entry is not None and os.path.exists(entry.file("output.wav")):
+            return key, (AudioBuffer.from_file(entry.file("output.wav")), entry.meta["timeline"])
+        return key, None
+
+    def _store_synthesis(self, key, buffer, timeline):
+        if key is not None:
+            wav = io.BytesIO()
+            sf.write(wav, buffer.samples, samplerate=SAMPLE_RATE, format="WAV")
+            self.cache.put("synthesize", key, {"output.wav": wav.getvalue()}, {"duration": buffer.duration, "timeline": timeline})
+        return buffer, timeline
+
+    @traced("tts.synthesize_buffer")
+    def synthesize_buffer(self, text, speed=1.15):
+        # Returns (AudioBuffer, timeline) without touching the disk; the cache stores the audio as WAV
+        text = self.normalize(text)
+        key, cached = self._load_synthesis(text, self.voice_name, speed)
+        if cached is not None:
+            return cached
+
+        pipeline = get_pipeline(self.lang_code, self.repo_id)
+        voice = get_voice(self.voice_name, self.lang_code, self.repo_id)
+        buffer, timeline = _join_chunks((result.graphemes, result.audio, result.tokens) for result in pipeline(text, voice=voice, speed=speed))
+        return self._store_synthesis(key, buffer, timeline)
+
+    @traced("tts.synthesize_variants")
+    def synthesize_variants(self, text, variants):
+        # A/B narrations of one text. variants are {"gender", "voice", "speed"} dicts (missing keys fall back to
+        # this narrator and 1.15); returns [(AudioBuffer, timeline)] in the same order. Normalization and G2P
+        # run once and only the acoustic model runs per variant. KModel takes a single sequence, so variants
+        # run one after another, grouped by voice so each voice pack is moved to the model's device once.
+        text = self.normalize(text)
+        results = [None] * len(variants)
+        pending = {}
+        for i, variant in enumerate(variants):
+            gender = variant.get("gender", self.gender)
+            voice = variant.get("voice") or (self.voice if gender == self.gender else None)
+            voice_name = voice_name_for(gender, voice, self.lang_code)
+            speed = variant.get("speed", 1.15)
+            key, cached = self._load_synthesis(text, voice_name, speed)
+            if cached is not None:
+                results[i] = cached
             else:
-                return full
-        return CURSE_WORDS_PATTERN.sub(replacer, PATTERN.sub(replacer, text))
-
-    def synthesize(self, text, speed=1.15, name="output"):
-        text = self._expand_abbreviations(text)
-        pipeline = KPipeline(lang_code="a", repo_id='hexgrad/Kokoro-82M')
-        generator = pipeline(text, voice=f"a{self.gender}_{self.voice}", speed=speed)
-
-        all_audio = []
-        for (_, _, audio) in generator:
-            all_audio.append(audio)
-
-        combined_audio = np.concatenate(all_audio, axis=0)
-        output_path = os.path.join(self.result_folder, f"{name}.wav")
-        sf.write(output_path, combined_audio, samplerate=24000)
-        return os.path.abspath(output_path), sf.info(output_path).duration
-    
+                pending.setdefault(voice_name, []).append((i, speed, key))
+        if not pending:
+            return results
+
+        pipeline = get_pipeline(self.lang_code, self.repo_id)
+        shared = self.lang_code in ENGLISH_LANG_CODES
+        if shared:
+            from kokoro import KPipeline
+            chunks = phonemize(text, self.lang_code, self.repo_id)
+        for voice_name, items in pending.items():
+            pack = get_voice(voice_name, self.lang_code, self.repo_id)
+            if not shared:
+                # Other languages have no token-level G2P to share, they go through the full pipeline
+                for i, speed, key in items:
+                    results[i] = self._store_synthesis(key, *_join_chunks((result.graphemes, result.audio, result.tokens) for result in pipeline(text, voice=pack, speed=speed)))
+                continue
+            pack = pack.to(pipeline.model.device)
+            for i, speed, key in items:
+                pieces = []
+                for graphemes, phonemes, tokens in chunks:
+                    tokens = copy.deepcopy(list(tokens))
+                    output = KPipeline.infer(pipeline.model, phonemes, pack, speed)
+                    if output.pred_dur is not None:
+                        KPipeline.join_timestamps(tokens, output.pred_dur)
+                    pieces.append((graphemes, output.audio, tokens))
+                results[i] = self._store_synthesis(key, *_join_chunks(pieces))
+        return results
+
+    @traced("tts.synthesize_stream")
+    def synthesize_stream(self, text, speed=1.15, name="output", output_format="wav", silence_threshold=None, on_chunk=None):
+        # Writes every Kokoro chunk to disk (WAV via SoundFile, or mp3 via an ffmpeg pipe) as soon as it is
+        # produced, so peak memory stays at one chunk regardless of story length. With silence_threshold set,
+        # leading silence is dropped and trailing silence is held back until louder audio follows, which
+        # trims the clip without a second pass. on_chunk(samples, start_time) sees each written piece.
+        text = self.normalize(text)
+        output_path = os.path.join(self.result_folder, f"{name}.{output_format}")
+        pipeline = get_pipeline(self.lang_code, self.repo_id)
+        voice = get_voice(self.voice_name, self.lang_code, self.repo_id)
+
+        segments = []
+        offset = 0.0
+        consumed = 0
+        written = 0
+        leading_trim = 0 if silence_threshold is None else None
+        held = []
+
+        with atomic_path(output_path) as tmp_path:
+            sink = _WavSink(tmp_path, SAMPLE_RATE) if output_format == "wav" else _FfmpegSink(tmp_path, SAMPLE_RATE)
+            try:
+                for result in pipeline(text, voice=voice, speed=speed):
+                    if result.audio is None:
+                        continue
+                    samples = np.asarray(result.audio, dtype=np.float32).reshape(-1)
+                    chunk_duration = len(samples) / SAMPLE_RATE
+                    segments.append({
+                        "text": result.graphemes,
+                        "start": round(offset, 3),
+                        "end": round(offset + chunk_duration, 3),
+                        "words": _timeline_words(result.tokens, offset),
+                    })
+                    offset += chunk_duration
+                    chunk_start = consumed
+                    consumed += len(samples)
+
+                    if silence_threshold is not None:
+                        start, end = AudioBuffer(samples).silence_bounds(silence_threshold)
+                        if start == end:
+                            # Entirely silent: skip it while still leading, otherwise hold it back
+                            if leading_trim is not None:
+                                held.append(samples)
+                            continue
+                        if leading_trim is None:
+                            leading_trim = chunk_start + start
+                            samples = samples[start:]
+                            end -= start
+                        pieces = held + [samples[:end]]
+                        held = [samples[end:]] if end < len(samples) else []
+                    else:
+                        pieces = [samples]
+
+                    for piece in pieces:
+                        sink.write(piece)
+                        if on_chunk is not None:
+                            on_chunk(piece, written / SAMPLE_RATE)
+                        written += len(piece)
+            finally:
+                sink.close()
+
+        duration = written / SAMPLE_RATE
+        timeline = shift_timeline({"segments": segments}, (leading_trim or 0) / SAMPLE_RATE, duration)
+        return os.path.abspath(output_path), duration, timeline
+
+    @traced("tts.synthesize_parallel")
+    def synthesize_parallel(self, text, speed=1.15, workers=4, max_chars=400, gap_duration=250, crossfade_duration=10, silence_threshold=-50.0, torch_threads=None):
+        # Splits the story at sentence boundaries and synthesizes the chunks in worker processes, each with
+        # its own warm KPipeline. Chunks are trimmed, given short fades at their edges and joined with the
+        # same gap_duration (ms) of silence; word timings are shifted onto the stitched timeline.
+        text = self.normalize(text)
+        key = None
+        if self.cache is not None:
+            key = self.cache.key("synthesize_parallel", text, self.voice_name, speed, self.repo_id, max_chars, gap_duration, crossfade_duration, silence_threshold)
+            entry = self.cache.get("synthesize_parallel", key)
+            if entry is not None and os.path.exists(entry.file("output.wav")):
+                return AudioBuffer.from_file(entry.file("output.wav")), entry.meta["timeline"]
+
+        chunks = split_text(text, max_chars)
+        pool = get_process_pool(workers, torch_threads, self.lang_code, self.repo_id)
+        futures = [pool.submit(_synthesize_chunk, chunk, self.voice_name, speed, self.lang_code, self.repo_id) for chunk in chunks]
+
+        gap = np.zeros(int(SAMPLE_RATE * gap_duration / 1000), dtype=np.float32)
+        pieces = []
+        segments = []
+        position = 0
+        for chunk, future in zip(chunks, futures):
+            audio, words = future.result()
+            buffer = AudioBuffer(audio)
+            start, end = buffer.silence_bounds(silence_threshold)
+            if start == end:
+                continue
+            buffer = AudioBuffer(audio[start:end]).fade(crossfade_duration, crossfade_duration, from_gain=-60.0)
+            if pieces:
+                pieces.append(gap)
+                position += len(gap)
+            chunk_offset = position / SAMPLE_RATE
+            shifted = shift_timeline({"segments": [{"words": words}]}, start / SAMPLE_RATE, buffer.duration)
+            segments.append({
+                "text": chunk,
+                "start": round(chunk_offset, 3),
+                "end": round(chunk_offset + buffer.duration, 3),
+                "words": shift_timeline(shifted, -chunk_offset)["segments"][0]["words"],
+            })
+            pieces.append(buffer.samples)
+            position += len(buffer)
+
+        result = AudioBuffer(np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32))
+        timeline = {"segments": segments}
+
+        if key is not None:
+            wav = io.BytesIO()
+            sf.write(wav, result.samples, samplerate=SAMPLE_RATE, format="WAV")
+            self.cache.put("synthesize_parallel", key, {"output.wav": wav.getvalue()}, {"duration": result.duration, "timeline": timeline})
+        return result, timeline
+
+    @traced("tts.process_buffer")
+    def process_buffer(self, buffer, name, timeline=None, silence_threshold=-50.0, fade_in_duration=0, fade_out_duration=0):
+        # trim -> fade -> single encode, all on the in-memory array
+        trimmed, offset = buffer.trim_silence(silence_threshold)
+        if fade_in_duration > 0 or fade_out_duration > 0:
+            trimmed = trimmed.fade(fade_in_duration, fade_out_duration)
+        mp3_path = trimmed.encode(os.path.join(self.result_folder, f"{name}.mp3"), cache=self.cache)
+        if timeline is not None:
+            timeline = shift_timeline(timeline, offset, trimmed.duration)
+        return trimmed, mp3_path, timeline
+
+    @traced("tts.convert_wav_to_mp3")
     def convert_wav_to_mp3(self, wav_file_path):
         filename = os.path.basename(wav_file_path)
         name, _ = os.path.splitext(filename)
-        # Convert WAV to MP3 using ffmpeg
-        subprocess.run([
-            "ffmpeg",
-            "-y",          # overwrite output file if exists
-            "-i", wav_file_path,
-            "-codec:a", "libmp3lame",
-            "-b:a", "192k",
-            os.path.join(self.result_folder, f"{name}.mp3")
-        ], check=True)
         mp3_file_path = os.path.join(self.result_folder, f"{name}.mp3")
+
+        def create():
+            # Convert WAV to MP3 using ffmpeg
+            with atomic_path(mp3_file_path) as tmp_path:
+                subprocess.run([
+                    "ffmpeg",
+                    "-y",          # overwrite output file if exists
+                    "-i", wav_file_path,
+                    "-codec:a", "libmp3lame",
+                    "-b:a", "192k",
+                    tmp_path
+                ], check=True)
+            return {}
+
+        self._cached("convert_wav_to_mp3", lambda: [file_sha256(wav_file_path), "libmp3lame", "192k"], mp3_file_path, create)
         return os.path.abspath(mp3_file_path)
 
 if __name__ == "__main__":
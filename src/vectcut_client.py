@@ -0,0 +1,139 @@
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+RETRY_STATUSES = {502, 503, 504}
+
+# Endpoints that are safe to resend after the server may already have processed them:
+# save_draft just rewrites the draft, and a duplicate create_draft only leaves an unused draft.
+# add_* calls would duplicate tracks, so they are only retried when the request never reached the server.
+RETRYABLE_ENDPOINTS = {"create_draft", "save_draft"}
+
+def _never_sent(error):
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    reason = getattr(reason, "reason", reason)
+    return isinstance(reason, NewConnectionError)
+
+class VectCutClient:
+    def __init__(self, api_url="http://localhost:9001", timeout=(5, 120), retries=3, backoff=0.5, pool_size=8, batch_endpoint=None):
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.batch_endpoint = batch_endpoint
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def _record(self, endpoint, seconds, error=False, retry=False):
+        with self._lock:
+            metrics = self._metrics.setdefault(endpoint, {"calls": 0, "errors": 0, "retries": 0, "latencies": []})
+            if retry:
+                metrics["retries"] += 1
+                return
+            metrics["calls"] += 1
+            metrics["latencies"].append(seconds)
+            if error:
+                metrics["errors"] += 1
+
+    def _sleep_before_retry(self, attempt):
+        # Exponential backoff with full jitter so parallel stories don't retry in lockstep
+        time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def request(self, endpoint, data):
+        url = f"{self.api_url}/{endpoint}"
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = self.session.post(url, json=data, timeout=self.timeout)
+            except requests.RequestException as e:
+                self._record(endpoint, time.perf_counter() - start, error=True)
+                retryable = endpoint in RETRYABLE_ENDPOINTS or (isinstance(e, requests.ConnectionError) and _never_sent(e))
+                if retryable and attempt < self.retries:
+                    self._record(endpoint, 0, retry=True)
+                    self._sleep_before_retry(attempt)
+                    attempt += 1
+                    continue
+                raise Exception(f"Request to {endpoint} failed: {str(e)}")
+
+            elapsed = time.perf_counter() - start
+            if response.status_code in RETRY_STATUSES and endpoint in RETRYABLE_ENDPOINTS and attempt < self.retries:
+                self._record(endpoint, elapsed, error=True)
+                self._record(endpoint, 0, retry=True)
+                self._sleep_before_retry(attempt)
+                attempt += 1
+                continue
+
+            try:
+                response.raise_for_status()
+                result = response.json()
+            except (requests.RequestException, ValueError) as e:
+                self._record(endpoint, elapsed, error=True)
+                raise Exception(f"Request to {endpoint} failed: {str(e)}")
+
+            if not result.get("success"):
+                self._record(endpoint, elapsed, error=True)
+                err = result.get("error", "Unknown error")
+                raise Exception(f"API Error: {err}")
+
+            self._record(endpoint, elapsed)
+            return result.get("output", {})
+
+    def send_batch(self, calls):
+        # calls: list of (endpoint, data). Uses the server's batch endpoint when one is configured,
+        # otherwise replays the calls in order over the pooled keep-alive connection.
+        if not calls:
+            return []
+        if self.batch_endpoint:
+            output = self.request(self.batch_endpoint, {"requests": [{"endpoint": endpoint, "data": data} for endpoint, data in calls]})
+            return output.get("results", []) if isinstance(output, dict) else output
+        return [self.request(endpoint, data) for endpoint, data in calls]
+
+    def reset_metrics(self):
+        with self._lock:
+            self._metrics = {}
+
+    def metrics(self):
+        summary = {}
+        with self._lock:
+            for endpoint, metrics in self._metrics.items():
+                latencies = sorted(metrics["latencies"])
+                count = len(latencies)
+                summary[endpoint] = {
+                    "calls": metrics["calls"],
+                    "errors": metrics["errors"],
+                    "retries": metrics["retries"],
+                    "mean": sum(latencies) / count if count else 0.0,
+                    "p50": latencies[int(0.5 * (count - 1))] if count else 0.0,
+                    "p95": latencies[int(0.95 * (count - 1))] if count else 0.0,
+                    "max": latencies[-1] if count else 0.0,
+                }
+        return summary
+
+    def print_metrics(self):
+        metrics = self.metrics()
+        if not metrics:
+            return
+        print("VectCut API latency:")
+        for endpoint, values in sorted(metrics.items()):
+            print(f"- {endpoint}: {values['calls']} calls, {values['errors']} errors, {values['retries']} retries, "
+                  f"p50 {values['p50'] * 1000:.0f} ms, p95 {values['p95'] * 1000:.0f} ms, max {values['max'] * 1000:.0f} ms")
@@ -0,0 +1,200 @@
+import contextlib
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+class FileLock:
+    # Exclusive lock shared by threads and processes, held on `path`.lock with flock (msvcrt on Windows).
+    # Reentrant within a thread, so a locked read-modify-write can call helpers that lock again.
+
+    def __init__(self, path):
+        self.path = f"{path}.lock"
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._file = open(self.path, "a+b")
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+                else:
+                    while True:
+                        try:
+                            self._file.seek(0)
+                            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            # LK_LOCK gives up after about 10 seconds
+                            continue
+            except BaseException:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            self._file.close()
+            self._file = None
+        self._lock.release()
+
+@contextlib.contextmanager
+def atomic_path(path):
+    # Yields a temporary path next to `path` and moves it into place only if the block succeeds,
+    # so readers never see a half-written artifact. The extension is kept for tools that sniff it.
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    base, ext = os.path.splitext(os.path.basename(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{base}.", suffix=f".tmp{ext}", dir=directory)
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def write_json_atomic(path, data):
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def story_id_for(title, text="", link=None):
+    # Reddit posts are scoped by their post id, everything else by a hash of its content
+    if link:
+        match = re.search(r"/comments/([a-z0-9]+)", link)
+        if match:
+            return f"reddit_{match.group(1)}"
+    digest = hashlib.sha256(f"{title}\n{text}".encode("utf-8")).hexdigest()
+    return f"story_{digest[:16]}"
+
+def variant_id_for(voice_name, speed, style=None):
+    # Narrations of one story in another voice, speed or style get their own workspace
+    variant = f"{voice_name}_{float(speed):g}"
+    if style:
+        digest = hashlib.sha256(json.dumps(style, sort_keys=True).encode("utf-8")).hexdigest()
+        variant += f"_{digest[:8]}"
+    return variant
+
+class StoryWorkspace:
+    def __init__(self, root, story_id, variant=None):
+        self.story_id = story_id
+        self.variant = variant
+        self.name = f"{story_id}/{variant}" if variant else story_id
+        self.dir = os.path.abspath(os.path.join(root, story_id, variant or ""))
+        self.manifest_path = os.path.join(self.dir, "manifest.json")
+        self._lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {"story_id": self.story_id, "artifacts": {}}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def record(self, name, path, **metadata):
+        entry = {
+            "path": os.path.relpath(os.path.abspath(path), self.dir),
+            "size": os.path.getsize(path),
+            "sha256": file_sha256(path),
+            "created": time.time(),
+        }
+        entry.update(metadata)
+        with self._lock:
+            manifest = self.load_manifest()
+            manifest["artifacts"][name] = entry
+            write_json_atomic(self.manifest_path, manifest)
+        return path
+
+    def artifact(self, name):
+        entry = self.load_manifest()["artifacts"].get(name)
+        if not entry:
+            return None
+        path = os.path.join(self.dir, entry["path"])
+        return path if os.path.exists(path) else None
+
+class Workspace:
+    def __init__(self, root, run_id=None):
+        self.root = os.path.abspath(root)
+        self.stories_dir = os.path.join(self.root, "stories")
+        self.produced_path = os.path.join(self.root, "produced.json")
+        self._lock = threading.Lock()
+        # Several processes (shards, render daemons) may share one results dir
+        self._produced_lock = FileLock(self.produced_path)
+        self._stories = {}
+        self.start_run(run_id)
+        os.makedirs(self.stories_dir, exist_ok=True)
+
+    def start_run(self, run_id=None):
+        # Long-lived processes start a new run per batch so no run record grows without bound
+        self.run_id = run_id or time.strftime("%Y%m%d-%H%M%S")
+        self.run_path = os.path.join(self.root, "runs", f"{self.run_id}.json")
+        self._run_lock = FileLock(self.run_path)
+
+    def story(self, story_id, variant=None):
+        with self._lock:
+            workspace = self._stories.get((story_id, variant))
+            if workspace is None:
+                workspace = StoryWorkspace(self.stories_dir, story_id, variant)
+                self._stories[(story_id, variant)] = workspace
+        return workspace
+
+    def record_run(self, story_id, status, **details):
+        with self._run_lock:
+            run = {"run_id": self.run_id, "stories": {}}
+            if os.path.exists(self.run_path):
+                with open(self.run_path, "r", encoding="utf-8") as f:
+                    run = json.load(f)
+            run["stories"][story_id] = dict(details, status=status, updated=time.time())
+            write_json_atomic(self.run_path, run)
+
+    def produced_ids(self):
+        # Stories that already made it to a finished video in any run
+        with self._produced_lock:
+            if not os.path.exists(self.produced_path):
+                return set()
+            with open(self.produced_path, "r", encoding="utf-8") as f:
+                return set(json.load(f))
+
+    def mark_produced(self, story_id, **details):
+        with self._produced_lock:
+            produced = {}
+            if os.path.exists(self.produced_path):
+                with open(self.produced_path, "r", encoding="utf-8") as f:
+                    produced = json.load(f)
+            produced[story_id] = dict(details, run_id=self.run_id, produced=time.time())
+            write_json_atomic(self.produced_path, produced)